@@ -0,0 +1,35 @@
+"""product listing indexes
+
+Revision ID: 3c1f8a2d9b47
+Revises: 00fff9aae2bd
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1f8a2d9b47'
+down_revision: Union[str, None] = '00fff9aae2bd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Keyset-пагинация по (Price, ProductID); по ProductID хватает первичного ключа
+    op.create_index('ix_products_price_id', 'Products', ['Price', 'ProductID'], unique=False)
+    # Фильтр по префиксу названия без учета регистра: lower("Name") LIKE 'abc%'
+    op.create_index(
+        'ix_products_name_lower_prefix',
+        'Products',
+        [sa.text('lower("Name") varchar_pattern_ops')],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_products_name_lower_prefix', table_name='Products')
+    op.drop_index('ix_products_price_id', table_name='Products')
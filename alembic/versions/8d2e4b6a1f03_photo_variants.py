@@ -0,0 +1,28 @@
+"""photo variants
+
+Revision ID: 8d2e4b6a1f03
+Revises: 3c1f8a2d9b47
+Create Date: 2026-10-18 12:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2e4b6a1f03'
+down_revision: Union[str, None] = '3c1f8a2d9b47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('Products', sa.Column('PhotoVariants', sa.JSON(none_as_null=True), nullable=True))
+    op.add_column('Users', sa.Column('PhotoVariants', sa.JSON(none_as_null=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('Users', 'PhotoVariants')
+    op.drop_column('Products', 'PhotoVariants')
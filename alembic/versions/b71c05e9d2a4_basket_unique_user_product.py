@@ -0,0 +1,32 @@
+"""basket unique user product
+
+Revision ID: b71c05e9d2a4
+Revises: 8d2e4b6a1f03
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b71c05e9d2a4'
+down_revision: Union[str, None] = '8d2e4b6a1f03'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Убираем дубли, появившиеся из-за гонки при добавлении, оставляя самую раннюю строку
+    op.execute(
+        'DELETE FROM "Baskets" a USING "Baskets" b '
+        'WHERE a."UsersID" = b."UsersID" AND a."ProductID" = b."ProductID" '
+        'AND a."BasketID" > b."BasketID"'
+    )
+    op.create_index('uq_baskets_user_product', 'Baskets', ['UsersID', 'ProductID'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('uq_baskets_user_product', table_name='Baskets')
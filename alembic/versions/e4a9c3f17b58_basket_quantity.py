@@ -0,0 +1,28 @@
+"""basket quantity
+
+Revision ID: e4a9c3f17b58
+Revises: b71c05e9d2a4
+Create Date: 2026-10-18 13:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a9c3f17b58'
+down_revision: Union[str, None] = 'b71c05e9d2a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('Baskets', sa.Column('Quantity', sa.Integer(), server_default='1', nullable=False))
+    op.create_check_constraint('ck_baskets_quantity_positive', 'Baskets', '"Quantity" > 0')
+
+
+def downgrade() -> None:
+    op.drop_constraint('ck_baskets_quantity_positive', 'Baskets', type_='check')
+    op.drop_column('Baskets', 'Quantity')
@@ -0,0 +1,52 @@
+"""product search
+
+Revision ID: f2b8d41c6e90
+Revises: e4a9c3f17b58
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b8d41c6e90'
+down_revision: Union[str, None] = 'e4a9c3f17b58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.add_column(
+        'Products',
+        sa.Column(
+            'SearchVector',
+            postgresql.TSVECTOR(),
+            sa.Computed(
+                "setweight(to_tsvector('simple', coalesce(\"Name\", '')), 'A') || "
+                "setweight(to_tsvector('simple', coalesce(\"Description\", '')), 'B')",
+                persisted=True
+            ),
+            nullable=True
+        )
+    )
+    op.create_index('ix_products_search_vector', 'Products', ['SearchVector'], unique=False, postgresql_using='gin')
+    op.create_index(
+        'ix_products_name_trgm',
+        'Products',
+        ['Name'],
+        unique=False,
+        postgresql_using='gin',
+        postgresql_ops={'Name': 'gin_trgm_ops'}
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_products_name_trgm', table_name='Products')
+    op.drop_index('ix_products_search_vector', table_name='Products')
+    op.drop_column('Products', 'SearchVector')
+    # Расширение pg_trgm не удаляем: им могут пользоваться другие объекты базы
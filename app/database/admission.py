@@ -0,0 +1,125 @@
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import AsyncIterator, Deque, Dict
+
+from fastapi import HTTPException, status
+
+from app.settings.settings import settings
+
+
+class Priority(IntEnum):
+    """Класс приоритета маршрута: освободившаяся сессия достается старшему классу"""
+    LOW = 0      # просмотр каталога
+    NORMAL = 1
+    HIGH = 2     # вход и изменения корзины
+
+
+class AdmissionController:
+    """Ограничивает число одновременных сессий БД и сбрасывает лишнюю нагрузку.
+
+    Сверх limit запросы ждут в очереди не дольше queue_timeout. Если очередь
+    заполнена, новый запрос вытесняет самый новый ожидающий запрос младшего
+    класса, а если такого нет - сразу получает 503 с Retry-After. Так при пиках
+    клиент быстро получает отказ вместо ожидания соединения до своего таймаута.
+    """
+
+    def __init__(self, limit: int, queue_size: int, queue_timeout: float):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        # В очередях только ожидающие futures: выданные, вытесненные и брошенные удаляются
+        self._queues: Dict[Priority, Deque[asyncio.Future]] = {priority: deque() for priority in Priority}
+        self.rejected = 0
+        self.timed_out = 0
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def waiting_by_priority(self) -> Dict[str, int]:
+        return {priority.name.lower(): len(queue) for priority, queue in self._queues.items()}
+
+    @staticmethod
+    def _overloaded() -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Сервис перегружен, повторите попытку позже",
+            headers={"Retry-After": str(settings.DB_ADMISSION_RETRY_AFTER)}
+        )
+
+    def _evict_lower(self, priority: Priority) -> bool:
+        for lower in Priority:
+            if lower >= priority:
+                return False
+            if self._queues[lower]:
+                self._queues[lower].pop().set_exception(self._overloaded())
+                self.rejected += 1
+                return True
+        return False
+
+    def _abandon(self, future: asyncio.Future, priority: Priority) -> None:
+        if future.done() and not future.cancelled() and future.exception() is None:
+            # Место уже передано этому запросу - возвращаем его следующему
+            self.release()
+            return
+        if future in self._queues[priority]:
+            self._queues[priority].remove(future)
+        future.cancel()
+
+    async def acquire(self, priority: Priority) -> None:
+        if self.active < self.limit and not self.waiting:
+            self.active += 1
+            return
+        if self.waiting >= self.queue_size and not self._evict_lower(priority):
+            self.rejected += 1
+            raise self._overloaded()
+
+        future = asyncio.get_running_loop().create_future()
+        self._queues[priority].append(future)
+        try:
+            done, _ = await asyncio.wait({future}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            self._abandon(future, priority)
+            raise
+        if not done:
+            self._abandon(future, priority)
+            self.timed_out += 1
+            raise self._overloaded()
+        # Вытесненный запрос получает здесь 503
+        future.result()
+
+    def release(self) -> None:
+        """Передает место старшему ожидающему запросу или освобождает его"""
+        for priority in sorted(Priority, reverse=True):
+            queue = self._queues[priority]
+            if queue:
+                queue.popleft().set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority) -> AsyncIterator[None]:
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+
+admission: AdmissionController = AdmissionController(
+    limit=settings.DB_ADMISSION_LIMIT or settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW,
+    queue_size=settings.DB_ADMISSION_QUEUE_SIZE,
+    queue_timeout=settings.DB_ADMISSION_QUEUE_TIMEOUT,
+)
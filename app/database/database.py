@@ -1,23 +1,166 @@
-from sqlalchemy import *
-from sqlalchemy.orm import sessionmaker
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import (
+    AsyncConnection,
     AsyncSession,
     create_async_engine,
+    async_sessionmaker,
     AsyncEngine
 )
-import os
+from sqlalchemy.orm import Session
 
+from app.database.admission import Priority, admission
+from app.database.errors import QUERY_CANCELED, sqlstate
 from app.settings.settings import settings
 
-async def get_engine() -> AsyncEngine:
-    return create_async_engine(str(settings.db_url))
+logger = logging.getLogger(__name__)
+
+# Один движок и одна фабрика сессий на процесс
+_engine: Optional[AsyncEngine] = None
+_session_factory: Optional[async_sessionmaker[AsyncSession]] = None
+
+
+def create_engine(url: Optional[str] = None) -> AsyncEngine:
+    """Создает движок с пулом соединений по настройкам (по умолчанию к основной БД)"""
+    connect_args = {"statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE}
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        connect_args["server_settings"] = {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}
+    engine = create_async_engine(
+        url or str(settings.db_url),
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        connect_args=connect_args,
+    )
+    event.listen(engine.sync_engine, "handle_error", _raise_for_timeout)
+    return engine
+
+
+def _raise_for_timeout(context) -> None:
+    # Запрос отменен сервером по statement_timeout: клиенту 503, а не 500
+    error = context.sqlalchemy_exception
+    if isinstance(error, DBAPIError) and sqlstate(error) == QUERY_CANCELED:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Запрос к базе данных выполнялся слишком долго",
+            headers={"Retry-After": str(settings.DB_ADMISSION_RETRY_AFTER)}
+        ) from error.orig
+
+
+@event.listens_for(Session, "after_begin")
+def _set_statement_timeout(session: Session, transaction, connection) -> None:
+    # SET LOCAL действует до конца транзакции, соединение возвращается в пул с общим значением
+    timeout_ms = session.info.get("statement_timeout_ms")
+    if timeout_ms:
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+
+
+def get_engine() -> AsyncEngine:
+    """Возвращает движок процесса, создавая его при первом обращении"""
+    global _engine
+    if _engine is None:
+        _engine = create_engine()
+    return _engine
+
+
+def get_session_factory() -> async_sessionmaker[AsyncSession]:
+    """Возвращает фабрику сессий процесса"""
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = async_sessionmaker(get_engine(), class_=AsyncSession, expire_on_commit=False)
+    return _session_factory
+
 
+async def warmup_engine(engine: AsyncEngine, connections: int) -> None:
+    """Открывает несколько соединений заранее, чтобы первые запросы не ждали подключения"""
+    connections = min(connections, settings.DB_POOL_SIZE)
+    if connections <= 0:
+        return
 
-async def get_session():
+    conns = [engine.connect() for _ in range(connections)]
+    try:
+        await asyncio.gather(*(conn.start() for conn in conns))
+        await asyncio.gather(*(conn.execute(text("SELECT 1")) for conn in conns))
+    finally:
+        # Соединения возвращаются в пул и остаются открытыми
+        await asyncio.gather(*(conn.close() for conn in conns), return_exceptions=True)
 
-    async_session = sessionmaker(await get_engine(), class_=AsyncSession, expire_on_commit=False)
-    async with async_session() as session:
-        try:
+
+async def init_engine() -> None:
+    """Создает движок и прогревает пул при старте приложения"""
+    get_session_factory()
+    try:
+        await warmup_engine(get_engine(), settings.DB_POOL_WARMUP)
+    except Exception as e:
+        # БД может подняться позже приложения, пул наполнится по первым запросам
+        logger.warning("Не удалось прогреть пул соединений: %s", e)
+
+
+async def dispose_engine() -> None:
+    """Закрывает все соединения пула при остановке приложения"""
+    global _engine, _session_factory
+    if _engine is not None:
+        await _engine.dispose()
+    _engine = None
+    _session_factory = None
+
+
+@asynccontextmanager
+async def admitted_session(priority: Priority, statement_timeout_ms: int = 0) -> AsyncIterator[AsyncSession]:
+    """Сессия основной БД с местом в admission и statement_timeout на каждую транзакцию"""
+    async with admission.slot(priority):
+        async with get_session_factory()() as session:
+            if statement_timeout_ms:
+                session.info["statement_timeout_ms"] = statement_timeout_ms
+            try:
+                yield session
+            finally:
+                await session.close()
+
+
+@asynccontextmanager
+async def admitted_connection(priority: Priority, statement_timeout_ms: int = 0) -> AsyncIterator[AsyncConnection]:
+    """Отдельное соединение основной БД с местом в admission - для потоковых и массовых операций,
+    которые сами управляют транзакциями. statement_timeout действует на все соединение
+    и сбрасывается перед возвратом в пул"""
+    async with admission.slot(priority):
+        async with get_engine().connect() as conn:
+            if statement_timeout_ms:
+                await conn.exec_driver_sql(f"SET statement_timeout = {int(statement_timeout_ms)}")
+                await conn.commit()
+            try:
+                yield conn
+            finally:
+                if statement_timeout_ms:
+                    try:
+                        await conn.rollback()
+                        await conn.exec_driver_sql("RESET statement_timeout")
+                        await conn.commit()
+                    except Exception:
+                        # Соединение с неизвестными настройками в пул не возвращается
+                        await conn.invalidate()
+
+
+def priority_session(
+    priority: Priority = Priority.NORMAL,
+    statement_timeout_ms: int = 0
+) -> Callable[[], AsyncIterator[AsyncSession]]:
+    """Зависимость с сессией основной БД: место в admission по приоритету маршрута
+    и statement_timeout на каждую транзакцию сессии"""
+
+    async def dependency() -> AsyncIterator[AsyncSession]:
+        async with admitted_session(priority, statement_timeout_ms) as session:
             yield session
-        finally:
-            await session.close()
\ No newline at end of file
+
+    return dependency
+
+
+get_session = priority_session()
\ No newline at end of file
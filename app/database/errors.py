@@ -0,0 +1,19 @@
+from typing import Optional
+
+from sqlalchemy.exc import DBAPIError
+
+# Коды ошибок PostgreSQL (SQLSTATE)
+FOREIGN_KEY_VIOLATION = "23503"
+UNIQUE_VIOLATION = "23505"
+QUERY_CANCELED = "57014"  # в том числе по statement_timeout
+
+
+def sqlstate(error: DBAPIError) -> Optional[str]:
+    """SQLSTATE исходной ошибки драйвера"""
+    return getattr(error.orig, "sqlstate", None) or getattr(error.orig, "pgcode", None)
+
+
+def constraint_name(error: DBAPIError) -> Optional[str]:
+    """Имя нарушенного ограничения, если драйвер его сообщил"""
+    cause = getattr(error.orig, "__cause__", None)
+    return getattr(cause, "constraint_name", None)
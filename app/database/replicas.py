@@ -0,0 +1,282 @@
+"""Чтение с реплик PostgreSQL.
+
+Маршруты только для чтения получают сессию через get_read_session (или
+read_session с приоритетом и statement_timeout маршрута): она берется
+с исправной реплики по кругу. Если реплик нет или все они неисправны,
+используется основная БД. После собственной записи пользователь
+DB_READ_YOUR_WRITES_WINDOW секунд читает из основной БД, чтобы не увидеть
+данные до своей записи из-за отставания реплики. Привязка передается
+клиенту подписанной cookie (и заголовком) с временем ее окончания, поэтому
+действует на любом воркере и хосте. Сессии реплик помечены info["replica"]: прочитанное
+через них не кладется в общий кэш товаров.
+"""
+import asyncio
+import hashlib
+import hmac
+import itertools
+import logging
+import math
+import time
+from contextvars import ContextVar
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+
+from fastapi import Depends
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import visitors
+from sqlalchemy.sql.dml import UpdateBase
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.database.admission import Priority, admission
+from app.database.database import create_engine, get_session_factory
+from app.schemas.user.user_schemas import CurrentUser
+from app.service.auth_service.dependencies import current_user_id, get_optional_user
+from app.settings.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Отставание реплики в секундах; 0, если все полученное уже применено или это не реплика
+REPLICATION_LAG_SQL = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+PIN_COOKIE = "rw_pin"
+PIN_HEADER = "X-Write-Pin"
+
+
+def _signature(payload: str) -> str:
+    return hmac.new(settings.JWT_SECRET_KEY.encode(), payload.encode(), hashlib.sha256).hexdigest()
+
+
+def encode_pin(user_id: int, until: float) -> str:
+    """Подписанная привязка: пользователь и unix-время ее окончания"""
+    payload = f"{user_id}.{int(until)}"
+    return f"{payload}.{_signature(payload)}"
+
+
+def decode_pin(value: str) -> Optional[Tuple[int, float]]:
+    """Пользователь и время окончания привязки или None, если значение подделано или испорчено"""
+    payload, _, signature = value.rpartition(".")
+    if not hmac.compare_digest(signature, _signature(payload)):
+        return None
+    try:
+        user_id, until = payload.split(".")
+        return int(user_id), float(until)
+    except ValueError:
+        return None
+
+
+class WritePin:
+    """Привязка к основной БД в рамках одного HTTP-запроса"""
+
+    def __init__(self, received: Optional[Tuple[int, float]]):
+        self.received = received
+        self.issued: Optional[Tuple[int, float]] = None
+
+    def pin(self, user_id: int) -> None:
+        self.issued = (user_id, time.time() + settings.DB_READ_YOUR_WRITES_WINDOW)
+
+    def is_pinned(self, user_id: int) -> bool:
+        now = time.time()
+        return any(
+            pin is not None and pin[0] == user_id and pin[1] > now
+            for pin in (self.received, self.issued)
+        )
+
+
+# Заполняется ReadYourWritesMiddleware; вне HTTP-запроса привязки нет
+write_pin: ContextVar[Optional[WritePin]] = ContextVar("write_pin", default=None)
+
+
+class ReadYourWritesMiddleware:
+    """ASGI-middleware: читает привязку из cookie или заголовка запроса и после
+    записи пользователя выдает новую в ответе"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        value = headers.get(PIN_HEADER) or _cookie(headers.get("cookie", ""), PIN_COOKIE)
+        pin = WritePin(decode_pin(value) if value else None)
+
+        async def send_wrapper(message: Message) -> None:
+            # Коммит выполняется до начала ответа, к этому моменту привязка уже известна
+            if message["type"] == "http.response.start" and pin.issued is not None:
+                token = encode_pin(*pin.issued)
+                response_headers = MutableHeaders(scope=message)
+                response_headers.append(PIN_HEADER, token)
+                response_headers.append(
+                    "set-cookie",
+                    f"{PIN_COOKIE}={token}; Max-Age={math.ceil(settings.DB_READ_YOUR_WRITES_WINDOW)}; "
+                    "Path=/; HttpOnly; SameSite=lax"
+                )
+            await send(message)
+
+        context_token = write_pin.set(pin)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            write_pin.reset(context_token)
+
+
+def _cookie(header: str, name: str) -> Optional[str]:
+    for part in header.split(";"):
+        key, _, value = part.strip().partition("=")
+        if key == name:
+            return value
+    return None
+
+
+def _has_dml(statement) -> bool:
+    # SELECT может изменять данные: INSERT/UPDATE/DELETE ... RETURNING в CTE или подзапросе
+    return any(isinstance(element, UpdateBase) for element in visitors.iterate(statement))
+
+
+def _mark_orm_execute(orm_execute_state) -> None:
+    if not orm_execute_state.is_select or _has_dml(orm_execute_state.statement):
+        orm_execute_state.session.info["wrote"] = True
+
+
+def _mark_flush(session: Session, flush_context) -> None:
+    session.info["wrote"] = True
+
+
+def _pin_after_commit(session: Session) -> None:
+    if session.info.pop("wrote", False):
+        user_id = current_user_id.get()
+        pin = write_pin.get()
+        if user_id is not None and pin is not None:
+            pin.pin(user_id)
+
+
+def _forget_after_rollback(session: Session) -> None:
+    session.info.pop("wrote", None)
+
+
+class ReplicaSet:
+    """Движки реплик, проверка их состояния и выбор по кругу"""
+
+    def __init__(self):
+        self._engines: List[AsyncEngine] = []
+        self._factories: List[async_sessionmaker[AsyncSession]] = []
+        self._healthy: List[Optional[bool]] = []  # None - еще не проверялась
+        self._counter = itertools.count()
+        self._health_task: Optional[asyncio.Task] = None
+
+    @property
+    def engines(self) -> List[AsyncEngine]:
+        return list(self._engines)
+
+    @staticmethod
+    def _label(engine: AsyncEngine) -> str:
+        return engine.url.render_as_string(hide_password=True)
+
+    async def start(self) -> None:
+        """Создает движки реплик, проверяет их и запускает периодическую проверку"""
+        urls = settings.db_replica_urls
+        if not urls or self._engines:
+            return
+        for url in urls:
+            engine = create_engine(make_url(url).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False))
+            self._engines.append(engine)
+            # info["replica"]: прочитанное с реплики может отставать и не должно попадать в общий кэш
+            self._factories.append(
+                async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False, info={"replica": True})
+            )
+            self._healthy.append(None)
+
+        # Учет записей нужен только при наличии реплик
+        event.listen(Session, "do_orm_execute", _mark_orm_execute)
+        event.listen(Session, "after_flush", _mark_flush)
+        event.listen(Session, "after_commit", _pin_after_commit)
+        event.listen(Session, "after_rollback", _forget_after_rollback)
+
+        await self.check_all()
+        self._health_task = asyncio.create_task(self._health_loop())
+
+    async def dispose(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+        if self._engines:
+            event.remove(Session, "do_orm_execute", _mark_orm_execute)
+            event.remove(Session, "after_flush", _mark_flush)
+            event.remove(Session, "after_commit", _pin_after_commit)
+            event.remove(Session, "after_rollback", _forget_after_rollback)
+        await asyncio.gather(*(engine.dispose() for engine in self._engines), return_exceptions=True)
+        self._engines, self._factories, self._healthy = [], [], []
+
+    @staticmethod
+    async def _lag(engine: AsyncEngine) -> float:
+        async with engine.connect() as conn:
+            return await conn.scalar(REPLICATION_LAG_SQL)
+
+    async def _check(self, index: int) -> None:
+        engine = self._engines[index]
+        try:
+            # Таймаут покрывает и подключение: недоступный хост не должен задерживать проверку
+            lag = await asyncio.wait_for(self._lag(engine), timeout=settings.DB_REPLICA_HEALTH_TIMEOUT)
+            healthy = float(lag) <= settings.DB_REPLICA_MAX_LAG
+            reason = f"отставание {float(lag):.1f} с"
+        except Exception as e:
+            healthy = False
+            reason = str(e) or type(e).__name__
+
+        if healthy != self._healthy[index]:
+            log = logger.info if healthy else logger.warning
+            log("Реплика %s %s: %s", self._label(engine), "в ротации" if healthy else "исключена", reason)
+        self._healthy[index] = healthy
+
+    async def check_all(self) -> None:
+        await asyncio.gather(*(self._check(index) for index in range(len(self._engines))))
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.DB_REPLICA_HEALTH_INTERVAL)
+            await self.check_all()
+
+    def session_factory(self, user_id: Optional[int] = None) -> async_sessionmaker[AsyncSession]:
+        """Фабрика сессий для чтения: следующая исправная реплика или основная БД"""
+        pin = write_pin.get()
+        if user_id is not None and pin is not None and pin.is_pinned(user_id):
+            return get_session_factory()
+        healthy = [factory for factory, ok in zip(self._factories, self._healthy) if ok]
+        if not healthy:
+            return get_session_factory()
+        return healthy[next(self._counter) % len(healthy)]
+
+
+replica_set: ReplicaSet = ReplicaSet()
+
+
+def read_session(
+    priority: Priority = Priority.NORMAL,
+    statement_timeout_ms: int = 0
+) -> Callable[..., AsyncIterator[AsyncSession]]:
+    """Зависимость с сессией для маршрутов только для чтения"""
+
+    async def dependency(
+        current_user: Optional[CurrentUser] = Depends(get_optional_user)
+    ) -> AsyncIterator[AsyncSession]:
+        factory = replica_set.session_factory(current_user.UsersID if current_user else None)
+        async with admission.slot(priority):
+            async with factory() as session:
+                if statement_timeout_ms:
+                    session.info["statement_timeout_ms"] = statement_timeout_ms
+                yield session
+
+    return dependency
+
+
+get_read_session = read_session()
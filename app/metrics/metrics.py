@@ -0,0 +1,119 @@
+import asyncio
+import os
+from typing import Optional
+
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from app.database.admission import admission
+from app.database.database import get_engine
+from app.settings.settings import settings
+
+# HTTP: метка route - шаблон пути (/v1/{product_id}), а не сам путь
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса", ["method", "route"]
+)
+REQUESTS = Counter(
+    "http_requests_total", "HTTP-запросы по маршруту и статусу", ["method", "route", "status"]
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP-запросы в обработке", ["method"], multiprocess_mode="livesum"
+)
+
+# SQL в разрезе HTTP-запросов
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "SQL-запросов на один HTTP-запрос", ["route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100)
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "db_time_per_request_seconds", "Суммарное время SQL-запросов одного HTTP-запроса", ["route"]
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "Время выполнения SQL-запроса", ["operation"]
+)
+DB_SLOW_QUERIES = Counter(
+    "db_slow_queries_total", "SQL-запросы дольше METRICS_SLOW_QUERY_SECONDS", ["route"]
+)
+DB_N_PLUS_ONE = Counter(
+    "db_n_plus_one_total", "HTTP-запросы, в которых один и тот же SQL повторился много раз", ["route"]
+)
+
+
+def _pool_state():
+    """Текущие значения пула и допуска к БД: (имя, описание, метки, значение, накопительное)"""
+    pool = get_engine().pool
+    yield "db_pool_size", "Размер пула соединений", {}, pool.size(), False
+    yield "db_pool_checked_out", "Соединения, выданные из пула", {}, pool.checkedout(), False
+    yield "db_pool_checked_in", "Свободные соединения в пуле", {}, pool.checkedin(), False
+    yield "db_pool_overflow", "Соединения сверх DB_POOL_SIZE", {}, max(pool.overflow(), 0), False
+    yield "db_admission_active", "Сессии, допущенные к БД", {}, admission.active, False
+    for priority, count in admission.waiting_by_priority().items():
+        yield "db_admission_waiting", "Запросы в очереди допуска к БД", {"priority": priority}, count, False
+    yield "db_admission_rejected", "Запросы, отклоненные с 503 из-за перегрузки", {}, admission.rejected, True
+    yield "db_admission_timed_out", "Запросы, не дождавшиеся допуска к БД", {}, admission.timed_out, True
+
+
+class PoolCollector:
+    """Состояние пула соединений и допуска к БД на момент сбора метрик (один процесс)"""
+
+    def collect(self):
+        families = {}
+        for name, documentation, labels, value, cumulative in _pool_state():
+            family = families.get(name)
+            if family is None:
+                family_class = CounterMetricFamily if cumulative else GaugeMetricFamily
+                family = families[name] = family_class(name, documentation, labels=list(labels))
+            family.add_metric(list(labels.values()), value)
+        yield from families.values()
+
+
+class MultiprocessPoolExporter:
+    """Те же значения под gunicorn.
+
+    В многопроцессном режиме экспортируются только файлы PROMETHEUS_MULTIPROC_DIR,
+    а коллектор вызывался бы лишь в воркере, принявшем запрос. Поэтому каждый воркер
+    периодически записывает свои значения в Gauge, и они суммируются по процессам:
+    текущие - только по живым воркерам, накопительные - включая завершившиеся.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._gauges = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _gauge(self, name: str, documentation: str, labels, cumulative: bool) -> Gauge:
+        gauge = self._gauges.get(name)
+        if gauge is None:
+            gauge = self._gauges[name] = Gauge(
+                f"{name}_total" if cumulative else name, documentation, list(labels),
+                multiprocess_mode="sum" if cumulative else "livesum"
+            )
+        return gauge
+
+    def refresh(self) -> None:
+        for name, documentation, labels, value, cumulative in _pool_state():
+            gauge = self._gauge(name, documentation, labels, cumulative)
+            (gauge.labels(**labels) if labels else gauge).set(value)
+
+    async def _loop(self) -> None:
+        while True:
+            self.refresh()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+pool_exporter: MultiprocessPoolExporter = MultiprocessPoolExporter(settings.METRICS_POOL_REFRESH_SECONDS)
+
+if not MULTIPROCESS:
+    REGISTRY.register(PoolCollector())
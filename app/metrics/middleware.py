@@ -0,0 +1,55 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.metrics.metrics import (
+    DB_QUERIES_PER_REQUEST,
+    DB_TIME_PER_REQUEST,
+    REQUEST_LATENCY,
+    REQUESTS,
+    REQUESTS_IN_PROGRESS,
+)
+from app.metrics.query_tracker import finish_request, route_label, start_request
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: время, статус и SQL-запросы каждого HTTP-запроса.
+
+    Чистый ASGI, без BaseHTTPMiddleware: не буферизует потоковые ответы, а время
+    считается до отправки последнего байта тела.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        token = start_request(scope)
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_progress.dec()
+            # Маршрут известен только после того, как роутер сопоставил путь
+            route = route_label(scope)
+            REQUEST_LATENCY.labels(method, route).observe(elapsed)
+            REQUESTS.labels(method, route, str(status_code)).inc()
+            queries = finish_request(token)
+            if queries is not None:
+                DB_QUERIES_PER_REQUEST.labels(route).observe(queries.count)
+                DB_TIME_PER_REQUEST.labels(route).observe(queries.duration)
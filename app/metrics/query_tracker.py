@@ -0,0 +1,124 @@
+import logging
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.metrics.metrics import DB_N_PLUS_ONE, DB_QUERY_DURATION, DB_SLOW_QUERIES
+from app.settings.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "COPY", "TRUNCATE"}
+
+# Последние медленные запросы для /metrics/slow-queries
+slow_queries: Deque[Dict[str, Any]] = deque(maxlen=settings.METRICS_SLOW_QUERY_SAMPLES)
+
+
+def route_label(scope: dict) -> str:
+    """Шаблон маршрута для меток; неизвестные пути сводятся к одному значению"""
+    route = scope.get("route")
+    if route is not None:
+        return getattr(route, "path", "unmatched")
+    if scope.get("endpoint") is not None and scope.get("root_path"):
+        # Смонтированное приложение (/uploads)
+        return scope["root_path"]
+    return "unmatched"
+
+
+class RequestQueries:
+    """SQL-запросы одного HTTP-запроса"""
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.count = 0
+        self.duration = 0.0
+        self.statements: Counter = Counter()
+
+    @property
+    def route(self) -> str:
+        return route_label(self.scope)
+
+
+# Задачи, созданные при обработке запроса, копируют контекст и пишут в тот же объект
+_current: ContextVar[Optional[RequestQueries]] = ContextVar("request_queries", default=None)
+
+
+def start_request(scope: dict):
+    return _current.set(RequestQueries(scope))
+
+
+def finish_request(token) -> Optional[RequestQueries]:
+    queries = _current.get()
+    _current.reset(token)
+    if queries is not None:
+        _check_n_plus_one(queries)
+    return queries
+
+
+def _check_n_plus_one(queries: RequestQueries) -> None:
+    repeated = [
+        (statement, count) for statement, count in queries.statements.items()
+        if count >= settings.METRICS_N_PLUS_ONE_THRESHOLD
+    ]
+    if not repeated:
+        return
+    route = queries.route
+    DB_N_PLUS_ONE.labels(route).inc()
+    for statement, count in repeated:
+        logger.warning("Возможный N+1 в %s: запрос выполнен %d раз: %s", route, count, statement[:300])
+
+
+def _operation(statement: str) -> str:
+    keyword = statement.lstrip("( \n").split(None, 1)[0].upper() if statement.strip() else ""
+    return keyword if keyword in _OPERATIONS else "OTHER"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    # Соединение выполняет один запрос за раз: значение перезаписывается, а не копится.
+    # handle_error может не вызваться (предыдущий обработчик, например _raise_for_timeout,
+    # выбросил исключение), и тогда оставшееся время старта просто заменит следующий запрос
+    conn.info["query_started"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = conn.info.pop("query_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    DB_QUERY_DURATION.labels(_operation(statement)).observe(elapsed)
+
+    queries = _current.get()
+    if queries is not None:
+        queries.count += 1
+        queries.duration += elapsed
+        queries.statements[statement] += 1
+
+    if elapsed >= settings.METRICS_SLOW_QUERY_SECONDS:
+        route = queries.route if queries is not None else "background"
+        DB_SLOW_QUERIES.labels(route).inc()
+        slow_queries.append({
+            "route": route,
+            "duration_ms": round(elapsed * 1000, 1),
+            "statement": statement[:1000],
+            "at": time.time(),
+        })
+        logger.warning("Медленный запрос (%.0f мс) в %s: %s", elapsed * 1000, route, statement[:300])
+
+
+def _handle_error(context) -> None:
+    if context.connection is not None:
+        context.connection.info.pop("query_started", None)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Подключает учет запросов к движку (повторный вызов ничего не делает)"""
+    sync_engine = engine.sync_engine
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
@@ -1,6 +1,7 @@
 from sqlalchemy.orm import declarative_base, Mapped, mapped_column, relationship
-from sqlalchemy import Integer, String, Float, ForeignKey
-from typing import Optional
+from sqlalchemy import Integer, String, Float, ForeignKey, Index, JSON, CheckConstraint, Computed, func, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from typing import Dict, Optional
 
 Base = declarative_base()
 
@@ -14,28 +15,64 @@ class User(Base):
     Login: Mapped[str] = mapped_column(String(50), unique=True)
     Password: Mapped[str] = mapped_column(String(255))  # Рекомендую хранить хэш пароля
     Photo: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)  # Путь к фото
+    PhotoVariants: Mapped[Optional[Dict[str, str]]] = mapped_column(JSON(none_as_null=True), nullable=True)  # URL миниатюр и WebP; None - SQL NULL, а не JSON null
 
     baskets: Mapped[list["Basket"]] = relationship("Basket", back_populates="user")
 
 
 class Product(Base):
     __tablename__ = "Products"
+    __table_args__ = (
+        # Индексы под keyset-пагинацию и фильтрацию каталога
+        Index("ix_products_price_id", "Price", "ProductID"),
+        Index(
+            "ix_products_name_lower_prefix",
+            func.lower(text('"Name"')).label("name_lower"),
+            postgresql_ops={"name_lower": "varchar_pattern_ops"},
+        ),
+        # Полнотекстовый поиск и поиск с опечатками (pg_trgm)
+        Index("ix_products_search_vector", "SearchVector", postgresql_using="gin"),
+        Index(
+            "ix_products_name_trgm",
+            "Name",
+            postgresql_using="gin",
+            postgresql_ops={"Name": "gin_trgm_ops"},
+        ),
+    )
 
     ProductID: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     Name: Mapped[str] = mapped_column(String(100))
     Price: Mapped[float] = mapped_column(Float)
     Description: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
     Photo: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)  # Путь к фото товара
+    PhotoVariants: Mapped[Optional[Dict[str, str]]] = mapped_column(JSON(none_as_null=True), nullable=True)  # URL миниатюр и WebP; None - SQL NULL, а не JSON null
+    # Генерируется базой из Name и Description; не загружается вместе с товаром
+    SearchVector: Mapped[Optional[str]] = mapped_column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('simple', coalesce(\"Name\", '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(\"Description\", '')), 'B')",
+            persisted=True,
+        ),
+        deferred=True,
+    )
 
     baskets: Mapped[list["Basket"]] = relationship("Basket", back_populates="product")
 
 
 class Basket(Base):
     __tablename__ = "Baskets"
+    __table_args__ = (
+        # Товар в корзине пользователя встречается один раз; индекс обслуживает
+        # и поиск корзины по UsersID
+        Index("uq_baskets_user_product", "UsersID", "ProductID", unique=True),
+        CheckConstraint('"Quantity" > 0', name="ck_baskets_quantity_positive"),
+    )
 
     BasketID: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     UsersID: Mapped[int] = mapped_column(Integer, ForeignKey("Users.UsersID"))
     ProductID: Mapped[int] = mapped_column(Integer, ForeignKey("Products.ProductID"))
+    Quantity: Mapped[int] = mapped_column(Integer, default=1, server_default="1")
 
     user: Mapped["User"] = relationship("User", back_populates="baskets")
     product: Mapped["Product"] = relationship("Product", back_populates="baskets")
\ No newline at end of file
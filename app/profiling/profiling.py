@@ -0,0 +1,103 @@
+import hmac
+import logging
+import os
+import random
+import re
+import time
+from pathlib import Path
+
+from pyinstrument import Profiler
+from pyinstrument.renderers import PstatsRenderer, SpeedscopeRenderer
+from pyinstrument.session import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.settings.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_UNSAFE_CHARS = re.compile(r"[^A-Za-z0-9_.-]+")
+
+# Расширение файла и функция, превращающая сессию профилировщика в байты
+_FORMATS = {
+    "speedscope": (".speedscope.json", lambda session: SpeedscopeRenderer().render(session).encode()),
+    "pstats": (".pstats", lambda session: PstatsRenderer().render(session).encode("utf-8", "surrogateescape")),
+}
+
+
+class ProfileStore:
+    """Каталог-кольцо с профилями: хранится не больше max_files последних файлов"""
+
+    def __init__(self, directory: str, max_files: int, fmt: str):
+        if fmt not in _FORMATS:
+            raise ValueError(f"Неизвестный формат профиля: {fmt}")
+        self.directory = Path(directory)
+        self.max_files = max_files
+        self.extension, self._render = _FORMATS[fmt]
+
+    def file_name(self, scope: Scope) -> str:
+        path = _UNSAFE_CHARS.sub("_", scope["path"]).strip("_")[:80] or "root"
+        return f"{time.time_ns()}-{scope['method']}-{path}{self.extension}"
+
+    def save(self, session: Session, name: str) -> Path:
+        """Пишет профиль и удаляет самые старые файлы сверх лимита (вызывать в пуле потоков)"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        target = self.directory / name
+        tmp_path = target.with_name(f".{name}.tmp")
+        tmp_path.write_bytes(self._render(session))
+        os.replace(tmp_path, target)
+
+        # Имена начинаются с time_ns, поэтому сортировка по имени - по времени
+        files = sorted(p for p in self.directory.iterdir() if p.name.endswith(self.extension))
+        for old in files[:-self.max_files]:
+            old.unlink(missing_ok=True)
+        return target
+
+
+class ProfilingMiddleware:
+    """Профилирует выбранные запросы семплирующим профилировщиком pyinstrument.
+
+    Запрос профилируется, если в нем есть заголовок PROFILING_HEADER со значением
+    PROFILING_TOKEN или если он попал в случайную долю PROFILING_SAMPLE_RATE.
+    Режим async_mode="enabled" учитывает время ожидания на await в стеке запроса.
+    Имя файла профиля возвращается в заголовке ответа X-Profile-File.
+    Для остальных запросов остается одна проверка заголовка.
+    """
+
+    def __init__(self, app: ASGIApp, store: ProfileStore):
+        self.app = app
+        self.store = store
+        self._header = settings.PROFILING_HEADER.lower().encode("latin-1")
+        self._token = settings.PROFILING_TOKEN.encode("latin-1")
+
+    def _selected(self, scope: Scope) -> bool:
+        if self._token:
+            for name, value in scope["headers"]:
+                if name == self._header:
+                    return hmac.compare_digest(value, self._token)
+        return settings.PROFILING_SAMPLE_RATE > 0 and random.random() < settings.PROFILING_SAMPLE_RATE
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._selected(scope):
+            await self.app(scope, receive, send)
+            return
+
+        name = self.store.file_name(scope)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = [*message["headers"], (b"x-profile-file", name.encode())]
+            await send(message)
+
+        profiler = Profiler(interval=settings.PROFILING_INTERVAL, async_mode="enabled")
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            session = profiler.stop()
+            try:
+                await run_in_threadpool(self.store.save, session, name)
+            except Exception:
+                # Профиль не должен ломать ответ, который уже отправлен
+                logger.exception("Не удалось сохранить профиль %s", name)
@@ -0,0 +1,31 @@
+from typing import List
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import Basket
+from app.queries.product.product_queries import PRODUCT_COLUMNS, products
+from app.schemas.basket.basket_schemas import BasketItemWithProduct
+from app.schemas.product.product_schemas import ProductResponse
+
+baskets = Basket.__table__
+
+
+async def fetch_basket_items(session: AsyncSession, user_id: int) -> List[BasketItemWithProduct]:
+    """Корзина пользователя вместе с товарами одним JOIN, без ORM-сущностей"""
+    result = await session.execute(
+        select(baskets.c.BasketID, baskets.c.UsersID, baskets.c.Quantity, *PRODUCT_COLUMNS)
+        .join_from(baskets, products, products.c.ProductID == baskets.c.ProductID)
+        .where(baskets.c.UsersID == user_id)
+        .order_by(baskets.c.BasketID)
+    )
+    return [
+        BasketItemWithProduct(
+            BasketID=row.BasketID,
+            UsersID=row.UsersID,
+            ProductID=row.ProductID,
+            Quantity=row.Quantity,
+            product=ProductResponse.model_validate(row)
+        )
+        for row in result
+    ]
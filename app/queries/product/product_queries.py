@@ -0,0 +1,22 @@
+from sqlalchemy import Select, select
+
+from app.models.models import Product
+
+# Запросы только для чтения: выбираются колонки таблицы через Core, без
+# ORM-сущностей и identity map. Строки результата сразу превращаются в схемы.
+products = Product.__table__
+
+# Колонки, нужные ProductResponse
+PRODUCT_COLUMNS = (
+    products.c.ProductID,
+    products.c.Name,
+    products.c.Price,
+    products.c.Description,
+    products.c.Photo,
+    products.c.PhotoVariants,
+)
+
+
+def select_products(*extra_columns) -> Select:
+    """SELECT колонок товара (и дополнительных выражений) без загрузки сущностей"""
+    return select(*PRODUCT_COLUMNS, *extra_columns)
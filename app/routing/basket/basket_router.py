@@ -1,7 +1,22 @@
 from app.service.basket_service.basket_service import BasketService
-from app.database.database import get_session
+from app.database.admission import Priority
+from app.database.database import get_session, priority_session
+from app.database.replicas import get_read_session
+from app.schemas.basket.basket_schemas import (
+    BasketBulkRequest,
+    BasketBulkResponse,
+    BasketItemQuantity,
+    BasketItemResponse,
+    BasketItemWithProduct,
+    BasketSummary
+)
+from app.schemas.common.common_schemas import MessageResponse
+from app.schemas.user.user_schemas import CurrentUser
+from app.service.auth_service.dependencies import get_current_user
+from app.settings.settings import settings
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
+from typing import List
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
@@ -9,19 +24,74 @@ router = APIRouter(
     prefix = "/basket"
 )
 
-@router.get("/get_all_basket")
-async def get_all_basket(user_id: int, session: AsyncSession = Depends(get_session)):
-    result = await BasketService(session).get_user_basket(user_id)
+# Изменения корзины обслуживаются раньше просмотра каталога
+get_write_session = priority_session(Priority.HIGH, settings.DB_WRITE_STATEMENT_TIMEOUT_MS)
+
+@router.get("/get_all_basket", response_model=List[BasketItemWithProduct])
+async def get_all_basket(current_user: CurrentUser = Depends(get_current_user), session: AsyncSession = Depends(get_read_session)):
+    result = await BasketService(session).get_user_basket(current_user.UsersID)
+    return result
+
+
+@router.get("/summary", response_model=BasketSummary)
+async def get_basket_summary(current_user: CurrentUser = Depends(get_current_user), session: AsyncSession = Depends(get_session)):
+    result = await BasketService(session).get_summary(current_user.UsersID)
+    return result
+
+
+@router.post("/add_to_basket", response_model=BasketItemResponse)
+async def add_to_basket(product_id: int, current_user: CurrentUser = Depends(get_current_user), session: AsyncSession = Depends(get_write_session)):
+    result = await BasketService(session).add_to_basket(current_user.UsersID, product_id)
+    return result
+
+
+@router.post("/increment", response_model=BasketItemQuantity)
+async def increment_quantity(
+    product_id: int,
+    amount: int = Query(1, ge=1, le=100),
+    current_user: CurrentUser = Depends(get_current_user),
+    session: AsyncSession = Depends(get_write_session)
+):
+    result = await BasketService(session).increment(current_user.UsersID, product_id, amount)
+    return result
+
+
+@router.post("/decrement", response_model=BasketItemQuantity)
+async def decrement_quantity(
+    product_id: int,
+    amount: int = Query(1, ge=1, le=100),
+    current_user: CurrentUser = Depends(get_current_user),
+    session: AsyncSession = Depends(get_write_session)
+):
+    result = await BasketService(session).decrement(current_user.UsersID, product_id, amount)
+    return result
+
+
+@router.delete("/delete_from_basket", response_model=MessageResponse)
+async def delete_from_basket(product_id: int, current_user: CurrentUser = Depends(get_current_user), session: AsyncSession = Depends(get_write_session)):
+    await BasketService(session).remove_from_basket(current_user.UsersID, product_id)
+    return MessageResponse(message="Товар удален из корзины")
+
+
+@router.post("/bulk_add_to_basket", response_model=BasketBulkResponse)
+async def bulk_add_to_basket(request: BasketBulkRequest, current_user: CurrentUser = Depends(get_current_user), session: AsyncSession = Depends(get_write_session)):
+    result = await BasketService(session).add_many(current_user.UsersID, request.ProductIDs)
+    return result
+
+
+@router.post("/bulk_delete_from_basket", response_model=BasketBulkResponse)
+async def bulk_delete_from_basket(request: BasketBulkRequest, current_user: CurrentUser = Depends(get_current_user), session: AsyncSession = Depends(get_write_session)):
+    result = await BasketService(session).remove_many(current_user.UsersID, request.ProductIDs)
     return result
 
 
-@router.post("/add_to_basket")
-async def add_to_basket(user_id: int, product_id: int, session: AsyncSession = Depends(get_session)):
-    result = await BasketService(session).add_to_basket(user_id, product_id)
+@router.put("/replace_basket", response_model=BasketBulkResponse)
+async def replace_basket(request: BasketBulkRequest, current_user: CurrentUser = Depends(get_current_user), session: AsyncSession = Depends(get_write_session)):
+    result = await BasketService(session).replace_basket(current_user.UsersID, request.ProductIDs)
     return result
 
 
-@router.delete("/delete_from_basket")
-async def delete_from_basket(user_id: int, product_id: int, session: AsyncSession = Depends(get_session)):
-    result = await BasketService(session).remove_from_basket(user_id, product_id)
-    return result
\ No newline at end of file
+@router.delete("/clear_basket", response_model=MessageResponse)
+async def clear_basket(current_user: CurrentUser = Depends(get_current_user), session: AsyncSession = Depends(get_write_session)):
+    await BasketService(session).clear_basket(current_user.UsersID)
+    return MessageResponse(message="Корзина очищена")
\ No newline at end of file
@@ -0,0 +1,33 @@
+from typing import Any, Dict, List
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest
+from prometheus_client.multiprocess import MultiProcessCollector
+
+from app.metrics.metrics import MULTIPROCESS, pool_exporter
+from app.metrics.query_tracker import slow_queries
+
+router = APIRouter(include_in_schema=False)
+
+
+def _registry():
+    """Под gunicorn метрики всех воркеров собираются из PROMETHEUS_MULTIPROC_DIR"""
+    if not MULTIPROCESS:
+        return REGISTRY
+    # Значения этого воркера - свежие на момент сбора, остальных - на последнее обновление
+    pool_exporter.refresh()
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry)
+    return registry
+
+
+@router.get("/metrics")
+async def metrics():
+    return Response(content=generate_latest(_registry()), media_type=CONTENT_TYPE_LATEST)
+
+
+@router.get("/metrics/slow-queries")
+async def get_slow_queries() -> List[Dict[str, Any]]:
+    """Последние медленные SQL-запросы, новые первыми"""
+    return list(reversed(slow_queries))
@@ -1,14 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request, status
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.database.database import get_session
+from app.database.admission import Priority
+from app.database.database import get_session, priority_session
+from app.database.replicas import read_session
 from app.service.product_service.product_service import ProductService
-from typing import List, Optional
+from app.service.product_service.product_cache import product_cache
+from app.service.product_service.product_import import import_products, read_chunks, spool_request_body
+from app.service.product_service.product_export import MEDIA_TYPES, export_products, gzip_stream
+from app.schemas.product.product_schemas import (
+    CatalogFormat,
+    ProductBatchResponse,
+    ProductCacheStats,
+    ProductPage,
+    ProductResponse,
+    ProductSort,
+    ProductSuggestion
+)
+from app.schemas.user.user_schemas import CurrentUser
+from app.service.auth_service.dependencies import get_current_user
+from app.settings.settings import settings
+from typing import AsyncIterator, List, Optional
 import json
 
 router = APIRouter()
 
-@router.post("/", status_code=status.HTTP_201_CREATED)
+# Просмотр каталога - младший класс: при перегрузке отбрасывается первым,
+# а долгие запросы отменяются сервером по statement_timeout
+get_catalog_session = priority_session(Priority.LOW, settings.DB_CATALOG_STATEMENT_TIMEOUT_MS)
+get_catalog_read_session = read_session(Priority.LOW, settings.DB_CATALOG_STATEMENT_TIMEOUT_MS)
+
+@router.post("/", status_code=status.HTTP_201_CREATED, response_model=ProductResponse)
 async def create_product(
     name: str = Form(...),
     price: float = Form(...),
@@ -33,15 +55,130 @@ async def create_product(
             detail=f"Error creating product: {str(e)}"
         )
 
-@router.get("/{product_id}")
-async def get_product(
-    product_id: int,
-    session: AsyncSession = Depends(get_session)
+async def _start_stream(body: AsyncIterator):
+    """Запускает поток до начала ответа: место в admission и соединение берутся сразу,
+    поэтому перегрузка возвращается обычным ответом 503, а не обрывом потока"""
+    try:
+        first = await body.__anext__()
+    except StopAsyncIteration:
+        first = None
+
+    async def stream():
+        if first is None:
+            return
+        yield first
+        async for chunk in body:
+            yield chunk
+
+    return stream()
+
+@router.post("/import")
+async def import_products_endpoint(
+    request: Request,
+    format: Optional[CatalogFormat] = Query(None, description="по умолчанию по Content-Type: text/csv или NDJSON"),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """Импорт каталога из тела запроса; ход импорта возвращается потоком NDJSON.
+
+    Импорт перезаписывает товары по ProductID, поэтому доступен только с токеном;
+    тело читается после проверки токена.
+    """
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = CatalogFormat.csv if content_type.startswith("text/csv") else CatalogFormat.ndjson
+    spool = await spool_request_body(request)
+
+    async def events():
+        async for event in import_products(read_chunks(spool), format):
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(await _start_stream(events()), media_type="application/x-ndjson")
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_products_endpoint(
+    request: Request,
+    format: CatalogFormat = Query(CatalogFormat.ndjson)
+):
+    """Выгрузка всего каталога потоком; сжимается gzip, если клиент его принимает"""
+    body = export_products(format)
+    headers = {
+        "Content-Disposition": f'attachment; filename="products.{format.value}"',
+        "Vary": "Accept-Encoding",
+    }
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        body = gzip_stream(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(await _start_stream(body), media_type=MEDIA_TYPES[format], headers=headers)
+
+@router.get("/search", response_model=ProductPage)
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor из предыдущей страницы"),
+    session: AsyncSession = Depends(get_catalog_session)
 ):
     product_service = ProductService(session)
     try:
-        product = await product_service.get_product(product_id)
-        return product
+        return await product_service.search(q, limit=limit, cursor=cursor)
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error searching products: {str(e)}"
+        )
+
+@router.get("/search/suggest", response_model=List[ProductSuggestion])
+async def suggest_products(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=20),
+    session: AsyncSession = Depends(get_catalog_session)
+):
+    product_service = ProductService(session)
+    try:
+        return await product_service.suggest(q, limit=limit)
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error suggesting products: {str(e)}"
+        )
+
+@router.get("/batch", response_model=ProductBatchResponse)
+async def get_products_batch(
+    ids: List[int] = Query([], max_length=100, description="?ids=1&ids=2..."),
+):
+    if not ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Не указаны ID товаров"
+        )
+    # Сессия запроса не нужна: кэш, а при промахе - общий загрузчик
+    try:
+        body = await ProductService.get_products_batch_json(ids)
+        return Response(content=body, media_type="application/json")
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error getting products: {str(e)}"
+        )
+
+@router.get("/cache/stats", response_model=ProductCacheStats)
+async def get_cache_stats():
+    return product_cache.stats()
+
+# Маршруты с фиксированным путем (/export, /search, /batch, /cache/...) объявлены выше, чтобы
+# не перехватываться шаблоном /{product_id}
+@router.get("/{product_id}", response_model=ProductResponse)
+async def get_product(
+    product_id: int
+):
+    try:
+        body = await ProductService.get_product_json(product_id)
+        return Response(content=body, media_type="application/json")
     except HTTPException as he:
         raise he
     except Exception as e:
@@ -50,14 +187,29 @@ async def get_product(
             detail=f"Error getting product: {str(e)}"
         )
 
-@router.get("/")
+@router.get("/", response_model=ProductPage)
 async def get_all_products(
-    session: AsyncSession = Depends(get_session)
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor из предыдущей страницы"),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    name_prefix: Optional[str] = Query(None, min_length=1, max_length=100),
+    sort: ProductSort = Query(ProductSort.id_asc),
+    session: AsyncSession = Depends(get_catalog_read_session)
 ):
     product_service = ProductService(session)
     try:
-        products = await product_service.get_all_products()
-        return products
+        body = await product_service.get_all_products_json(
+            limit=limit,
+            cursor=cursor,
+            min_price=min_price,
+            max_price=max_price,
+            name_prefix=name_prefix,
+            sort=sort
+        )
+        return Response(content=body, media_type="application/json")
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
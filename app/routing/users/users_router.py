@@ -1,49 +1,76 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
 from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.database.database import get_session
+from app.database.admission import Priority
+from app.database.database import get_session, priority_session
+from app.database.replicas import get_read_session
 from app.service.user_service.user_service import UserService
-from app.schemas.user.user_schemas import UserAuth, UserRegistration, UserUpdate
+from app.service.upload_service.upload_service import UploadService
+from app.schemas.user.user_schemas import (
+    CurrentUser,
+    TokenRefreshRequest,
+    TokenResponse,
+    UserAuth,
+    UserRegisterResponse,
+    UserRegistration,
+    UserResponse,
+    UserUpdate,
+    UserUpdateResponse
+)
+from app.service.auth_service.dependencies import ensure_same_user, get_current_user
+from app.service.auth_service.token_service import token_service
+from app.settings.settings import settings
 from fastapi.security import OAuth2PasswordRequestForm
 
 router = APIRouter()
 
-@router.post("/register")
+# Регистрация и вход не должны отбрасываться из-за нагрузки на каталог
+get_auth_session = priority_session(Priority.HIGH, settings.DB_WRITE_STATEMENT_TIMEOUT_MS)
+
+@router.post("/register", response_model=UserRegisterResponse)
 async def register(
     request: UserRegistration,
-    session: AsyncSession = Depends(get_session)
+    session: AsyncSession = Depends(get_auth_session)
 ):
     user_service = UserService(session)
     user = await user_service.register(request)
     return {"message": "User created successfully", "user_id": user.UsersID}
 
-@router.post("/token")
+@router.post("/token", response_model=TokenResponse)
 async def login(
     auth_data: UserAuth,
-    session: AsyncSession = Depends(get_session)
+    session: AsyncSession = Depends(get_auth_session)
 ):
     user_service = UserService(session)
     user = await user_service.authenticate(auth_data)
-    return user
+    return token_service.issue_for(user)
+
+@router.post("/token/refresh", response_model=TokenResponse)
+async def refresh_token(request: TokenRefreshRequest):
+    return token_service.refresh(request.refresh_token)
 
-@router.get("/users/{user_id}")
+@router.get("/users/{user_id}", response_model=UserResponse)
 async def get_user(
     user_id: int,
-    session: AsyncSession = Depends(get_session)
+    current_user: CurrentUser = Depends(get_current_user),
+    session: AsyncSession = Depends(get_read_session)
 ):
+    ensure_same_user(current_user, user_id)
     user_service = UserService(session)
     user = await user_service.get_user_by_id(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
-@router.put("/users/{user_id}")
+@router.put("/users/{user_id}", response_model=UserUpdateResponse)
 async def update_user(
     user_id: int,
     request: UserUpdate = Depends(),
     photo_file: UploadFile = File(None),
+    current_user: CurrentUser = Depends(get_current_user),
     session: AsyncSession = Depends(get_session)
 ):
+    ensure_same_user(current_user, user_id)
     user_service = UserService(session)
     
     update_data = request.dict(exclude_unset=True)
@@ -51,8 +78,10 @@ async def update_user(
     if photo_file:
         try:
             file_name = await UserService.save_uploaded_file(photo_file)
-            full_photo_url = f"http://212.20.53.169:1211/uploads/{file_name}"
+            full_photo_url = UploadService.public_url(file_name)
             update_data["Photo"] = full_photo_url
+        except HTTPException as he:
+            raise he
         except Exception as e:
             return JSONResponse(
                 status_code=500,
@@ -0,0 +1,42 @@
+from enum import Enum
+from pydantic import BaseModel, Field
+from typing import List
+from app.schemas.product.product_schemas import ProductResponse
+
+class BasketBulkRequest(BaseModel):
+    ProductIDs: List[int] = Field(..., max_length=500)
+
+class BasketItemStatus(str, Enum):
+    added = "added"
+    already_in_basket = "already_in_basket"
+    removed = "removed"
+    not_in_basket = "not_in_basket"
+    not_found = "not_found"
+
+class BasketItemResult(BaseModel):
+    ProductID: int
+    Status: BasketItemStatus
+
+class BasketBulkResponse(BaseModel):
+    results: List[BasketItemResult]
+
+class BasketItemQuantity(BaseModel):
+    ProductID: int
+    Quantity: int
+
+class BasketSummary(BaseModel):
+    ItemCount: int
+    TotalQuantity: int
+    TotalPrice: float
+
+class BasketItemResponse(BaseModel):
+    BasketID: int
+    UsersID: int
+    ProductID: int
+    Quantity: int
+
+    class Config:
+        from_attributes = True
+
+class BasketItemWithProduct(BasketItemResponse):
+    product: ProductResponse
\ No newline at end of file
@@ -1,11 +1,24 @@
-from pydantic import BaseModel
-from typing import Optional
+from enum import Enum
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
 
 class ProductCreateRequest(BaseModel):
     Name: str
     Price: float
     Description: Optional[str] = None
 
+class ProductImportRow(ProductCreateRequest):
+    """Строка импорта; с ProductID обновляет существующий товар, без него создает новый"""
+    ProductID: Optional[int] = Field(None, gt=0)
+    Name: str = Field(..., min_length=1, max_length=100)
+    Price: float = Field(..., ge=0, allow_inf_nan=False)
+    Description: Optional[str] = Field(None, max_length=500)
+
+class CatalogFormat(str, Enum):
+    """Формат файла каталога для импорта и экспорта"""
+    csv = "csv"
+    ndjson = "ndjson"
+
 class ProductUpdateRequest(BaseModel):
     Name: Optional[str] = None
     Price: Optional[float] = None
@@ -17,6 +30,36 @@ class ProductResponse(BaseModel):
     Price: float
     Description: Optional[str] = None
     Photo: Optional[str] = None
+    PhotoVariants: Optional[Dict[str, str]] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class ProductSort(str, Enum):
+    id_asc = "id"
+    id_desc = "-id"
+    price_asc = "price"
+    price_desc = "-price"
+
+class ProductPage(BaseModel):
+    items: List[ProductResponse]
+    next_cursor: Optional[str] = None
+
+class ProductBatchResponse(BaseModel):
+    items: List[ProductResponse]
+    missing: List[int]
+
+class ProductSuggestion(BaseModel):
+    ProductID: int
+    Name: str
+
+class ProductCacheStats(BaseModel):
+    entries: int
+    max_entries: int
+    ttl: float
+    hits: int
+    misses: int
+    hit_ratio: float
+    evictions: int
+    expirations: int
+    invalidations: int
\ No newline at end of file
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, Optional
 
 class UserAuth(BaseModel):
     Login: str
@@ -21,3 +21,38 @@ class UserUpdate(BaseModel):
     Surname: Optional[str] = None
     Patronymic: Optional[str] = None
     Photo: Optional[str] = None
+
+
+class CurrentUser(BaseModel):
+    UsersID: int
+    Login: str
+
+class TokenResponse(BaseModel):
+    access_token: str
+    refresh_token: str
+    token_type: str = "bearer"
+    expires_in: int
+    UsersID: int
+
+class TokenRefreshRequest(BaseModel):
+    refresh_token: str
+
+class UserResponse(BaseModel):
+    UsersID: int
+    Login: str
+    Name: str
+    Surname: str
+    Patronymic: Optional[str] = None
+    Photo: Optional[str] = None
+    PhotoVariants: Optional[Dict[str, str]] = None
+
+    class Config:
+        from_attributes = True
+
+class UserRegisterResponse(BaseModel):
+    message: str
+    user_id: int
+
+class UserUpdateResponse(BaseModel):
+    message: str
+    user: UserResponse
@@ -0,0 +1,51 @@
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from app.schemas.user.user_schemas import CurrentUser
+from app.service.auth_service.token_service import token_service
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+# ID пользователя текущего запроса: по нему после записи включается чтение из основной БД
+current_user_id: ContextVar[Optional[int]] = ContextVar("current_user_id", default=None)
+
+
+async def get_current_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)
+) -> CurrentUser:
+    """Текущий пользователь по access-токену, без обращения к БД"""
+    if credentials is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Требуется авторизация",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    user = token_service.verify_access(credentials.credentials)
+    current_user_id.set(user.UsersID)
+    return user
+
+
+async def get_optional_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)
+) -> Optional[CurrentUser]:
+    """Текущий пользователь, если передан действительный токен; иначе None"""
+    if credentials is None:
+        return None
+    try:
+        user = token_service.verify_access(credentials.credentials)
+    except HTTPException:
+        return None
+    current_user_id.set(user.UsersID)
+    return user
+
+
+def ensure_same_user(current_user: CurrentUser, user_id: int) -> None:
+    """Запрещает доступ к чужому профилю"""
+    if current_user.UsersID != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Нет доступа к данным другого пользователя"
+        )
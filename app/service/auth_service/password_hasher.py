@@ -0,0 +1,78 @@
+import asyncio
+import hmac
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import bcrypt
+from fastapi import HTTPException, status
+
+from app.settings.settings import settings
+
+BCRYPT_PREFIXES = ("$2a$", "$2b$", "$2y$")
+
+
+class PasswordHasher:
+    """Хэширование паролей bcrypt в отдельном ограниченном пуле потоков.
+
+    bcrypt отпускает GIL, поэтому хэширование в потоках масштабируется по ядрам
+    и не останавливает цикл событий. Число ожидающих операций ограничено:
+    при перегрузке вход отклоняется с 503, а не копится в очереди.
+    """
+
+    def __init__(self, workers: int, max_pending: int, rounds: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _run(self, func, *args):
+        if self._pending >= self.max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Сервис перегружен, повторите попытку позже",
+                headers={"Retry-After": "1"}
+            )
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self._pending -= 1
+
+    @staticmethod
+    def is_hashed(stored: str) -> bool:
+        return stored.startswith(BCRYPT_PREFIXES)
+
+    def _hash(self, password: str) -> str:
+        return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=self.rounds)).decode()
+
+    @staticmethod
+    def _check(password: str, stored: str) -> bool:
+        return bcrypt.checkpw(password.encode(), stored.encode())
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self._hash, password)
+
+    async def verify(self, password: str, stored: str) -> bool:
+        """Проверяет пароль; старые записи в открытом виде сравниваются напрямую"""
+        if not self.is_hashed(stored):
+            return hmac.compare_digest(password.encode(), stored.encode())
+        return await self._run(self._check, password, stored)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher: PasswordHasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+)
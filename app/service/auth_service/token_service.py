@@ -0,0 +1,98 @@
+import time
+from collections import OrderedDict
+from typing import Tuple
+
+import jwt
+from fastapi import HTTPException, status
+
+from app.models.models import User
+from app.schemas.user.user_schemas import CurrentUser, TokenResponse
+from app.settings.settings import settings
+
+ACCESS_TOKEN = "access"
+REFRESH_TOKEN = "refresh"
+
+
+class TokenService:
+    """Выпуск и проверка JWT.
+
+    Пользователь определяется только по утверждениям токена, без запроса к БД.
+    Проверенные access-токены кэшируются до истечения срока, поэтому повторные
+    запросы с тем же токеном не тратят время на проверку подписи.
+    """
+
+    def __init__(self, cache_size: int):
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Tuple[float, CurrentUser]]" = OrderedDict()
+
+    def _encode(self, user_id: int, login: str, token_type: str, ttl: int) -> str:
+        now = int(time.time())
+        payload = {
+            "sub": str(user_id),
+            "login": login,
+            "type": token_type,
+            "iat": now,
+            "exp": now + ttl,
+        }
+        return jwt.encode(payload, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+
+    def issue(self, user_id: int, login: str) -> TokenResponse:
+        """Выпускает пару access/refresh токенов"""
+        return TokenResponse(
+            access_token=self._encode(user_id, login, ACCESS_TOKEN, settings.ACCESS_TOKEN_TTL),
+            refresh_token=self._encode(user_id, login, REFRESH_TOKEN, settings.REFRESH_TOKEN_TTL),
+            expires_in=settings.ACCESS_TOKEN_TTL,
+            UsersID=user_id
+        )
+
+    def issue_for(self, user: User) -> TokenResponse:
+        return self.issue(user.UsersID, user.Login)
+
+    def _decode(self, token: str, token_type: str) -> Tuple[float, CurrentUser]:
+        try:
+            payload = jwt.decode(
+                token,
+                settings.JWT_SECRET_KEY,
+                algorithms=[settings.JWT_ALGORITHM],
+                options={"require": ["sub", "exp", "type"]}
+            )
+        except jwt.ExpiredSignatureError:
+            raise self._unauthorized("Срок действия токена истек")
+        except jwt.InvalidTokenError:
+            raise self._unauthorized("Недействительный токен")
+
+        if payload["type"] != token_type:
+            raise self._unauthorized("Недействительный токен")
+        return payload["exp"], CurrentUser(UsersID=int(payload["sub"]), Login=payload.get("login", ""))
+
+    def verify_access(self, token: str) -> CurrentUser:
+        """Проверяет access-токен, повторные проверки берутся из кэша"""
+        cached = self._cache.get(token)
+        if cached is not None:
+            expires_at, user = cached
+            if expires_at > time.time():
+                self._cache.move_to_end(token)
+                return user
+            del self._cache[token]
+
+        expires_at, user = self._decode(token, ACCESS_TOKEN)
+        self._cache[token] = (expires_at, user)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return user
+
+    def refresh(self, refresh_token: str) -> TokenResponse:
+        """Выпускает новую пару токенов по refresh-токену"""
+        _, user = self._decode(refresh_token, REFRESH_TOKEN)
+        return self.issue(user.UsersID, user.Login)
+
+    @staticmethod
+    def _unauthorized(detail: str) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=detail,
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+
+token_service: TokenService = TokenService(cache_size=settings.TOKEN_CACHE_SIZE)
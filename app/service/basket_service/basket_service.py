@@ -1,51 +1,255 @@
 from typing import List
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
+from sqlalchemy import Integer, bindparam, select, delete, update, func, literal, any_, union_all
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException, status
+from app.database.errors import FOREIGN_KEY_VIOLATION, constraint_name, sqlstate
 from app.models.models import Basket, Product
-from sqlalchemy.orm import selectinload
+from app.schemas.basket.basket_schemas import (
+    BasketBulkResponse,
+    BasketItemQuantity,
+    BasketItemResult,
+    BasketItemStatus,
+    BasketItemWithProduct,
+    BasketSummary
+)
+from app.queries.basket.basket_queries import fetch_basket_items
+
+def _ids_param(product_ids: List[int]):
+    # Один параметр-массив вместо IN (...): текст запроса не зависит от числа товаров
+    return any_(bindparam("product_ids", product_ids, type_=ARRAY(Integer)))
+
 
 class BasketService:
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    async def add_to_basket(self, user_id: int, product_id: int) -> Basket:
-        """Добавляет товар в корзину пользователя"""
-        # Проверяем существует ли товар
-        product = await self.session.get(Product, product_id)
-        if not product:
+    @staticmethod
+    def _raise_for_foreign_key(error: IntegrityError) -> None:
+        """Превращает нарушение внешнего ключа в 404 по пользователю или товару"""
+        if sqlstate(error) != FOREIGN_KEY_VIOLATION:
+            return
+        if constraint_name(error) == "Baskets_UsersID_fkey":
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
-                detail="Товар не найден"
+                detail="Пользователь не найден"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Товар не найден"
+        )
+
+    def _add_query(self, user_id: int, product_ids: List[int]):
+        """Запрос: вставка существующих товаров из списка в корзину и признак добавления по каждому"""
+        existing = (
+            select(Product.ProductID)
+            .where(Product.ProductID == _ids_param(product_ids))
+            .cte("existing")
+        )
+        inserted = (
+            insert(Basket)
+            .from_select(
+                # Quantity явно: Python-default колонки не подставляется, если запрос вложен в подзапрос
+                ["UsersID", "ProductID", "Quantity"],
+                select(literal(user_id, Integer), existing.c.ProductID, literal(1, Integer))
             )
+            .on_conflict_do_nothing(index_elements=[Basket.UsersID, Basket.ProductID])
+            .returning(Basket.ProductID)
+            .cte("inserted")
+        )
+        added_status = (
+            select(
+                existing.c.ProductID,
+                (inserted.c.ProductID.isnot(None)).label("added")
+            )
+            .select_from(existing.outerjoin(inserted, inserted.c.ProductID == existing.c.ProductID))
+        )
+        return added_status
+
+    async def _execute_bulk(self, query) -> dict:
+        try:
+            result = await self.session.execute(query)
+            rows = result.all()
+            await self.session.commit()
+        except IntegrityError as e:
+            await self.session.rollback()
+            if sqlstate(e) == FOREIGN_KEY_VIOLATION:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Пользователь не найден"
+                )
+            raise
+        return {product_id: value for product_id, value in rows}
+
+    @staticmethod
+    def _report(product_ids: List[int], statuses: dict, default: BasketItemStatus) -> BasketBulkResponse:
+        return BasketBulkResponse(results=[
+            BasketItemResult(ProductID=product_id, Status=statuses.get(product_id, default))
+            for product_id in product_ids
+        ])
+
+    async def add_many(self, user_id: int, product_ids: List[int]) -> BasketBulkResponse:
+        """Добавляет несколько товаров в корзину одним запросом"""
+        product_ids = list(dict.fromkeys(product_ids))
+        if not product_ids:
+            return BasketBulkResponse(results=[])
 
-        # Проверяем нет ли уже этого товара в корзине
-        existing_item = await self.session.execute(
-            select(Basket)
+        rows = await self._execute_bulk(self._add_query(user_id, product_ids))
+        statuses = {
+            product_id: BasketItemStatus.added if added else BasketItemStatus.already_in_basket
+            for product_id, added in rows.items()
+        }
+        return self._report(product_ids, statuses, BasketItemStatus.not_found)
+
+    async def remove_many(self, user_id: int, product_ids: List[int]) -> BasketBulkResponse:
+        """Удаляет несколько товаров из корзины одним запросом"""
+        product_ids = list(dict.fromkeys(product_ids))
+        if not product_ids:
+            return BasketBulkResponse(results=[])
+
+        result = await self.session.execute(
+            delete(Basket)
             .where(Basket.UsersID == user_id)
-            .where(Basket.ProductID == product_id)
+            .where(Basket.ProductID == _ids_param(product_ids))
+            .returning(Basket.ProductID)
+        )
+        removed = set(result.scalars().all())
+        await self.session.commit()
+        statuses = {product_id: BasketItemStatus.removed for product_id in removed}
+        return self._report(product_ids, statuses, BasketItemStatus.not_in_basket)
+
+    async def replace_basket(self, user_id: int, product_ids: List[int]) -> BasketBulkResponse:
+        """Заменяет содержимое корзины списком товаров одним запросом"""
+        product_ids = list(dict.fromkeys(product_ids))
+
+        # Удаление и вставка - изменяющие CTE одного запроса, то есть одна транзакция
+        deleted = (
+            delete(Basket)
+            .where(Basket.UsersID == user_id)
+            .where(~(Basket.ProductID == _ids_param(product_ids)))
+            .returning(Basket.ProductID)
+            .cte("deleted")
+        )
+        added_status = self._add_query(user_id, product_ids).subquery()
+        query = union_all(
+            select(added_status.c.ProductID, added_status.c.added.cast(Integer)),
+            select(deleted.c.ProductID, literal(-1, Integer))
         )
-        if existing_item.scalar():
+
+        rows = await self._execute_bulk(query)
+        statuses = {
+            product_id: {
+                1: BasketItemStatus.added,
+                0: BasketItemStatus.already_in_basket,
+                -1: BasketItemStatus.removed,
+            }[code]
+            for product_id, code in rows.items()
+        }
+        report = self._report(product_ids, statuses, BasketItemStatus.not_found)
+        report.results.extend(
+            BasketItemResult(ProductID=product_id, Status=BasketItemStatus.removed)
+            for product_id, code in rows.items() if code == -1
+        )
+        return report
+
+    async def add_to_basket(self, user_id: int, product_id: int) -> Basket:
+        """Добавляет товар в корзину пользователя одним запросом"""
+        # Существование товара проверяет внешний ключ, повтор - уникальный индекс
+        query = (
+            insert(Basket)
+            .values(UsersID=user_id, ProductID=product_id)
+            .on_conflict_do_nothing(index_elements=[Basket.UsersID, Basket.ProductID])
+            .returning(Basket)
+        )
+        try:
+            result = await self.session.execute(query)
+            basket_item = result.scalar_one_or_none()
+            await self.session.commit()
+        except IntegrityError as e:
+            await self.session.rollback()
+            self._raise_for_foreign_key(e)
+            raise
+
+        if basket_item is None:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Товар уже в корзине"
             )
+        return basket_item
 
-        # Добавляем товар в корзину
-        basket_item = Basket(UsersID=user_id, ProductID=product_id)
-        self.session.add(basket_item)
+    async def increment(self, user_id: int, product_id: int, amount: int = 1) -> BasketItemQuantity:
+        """Увеличивает количество товара в корзине, добавляя его при отсутствии"""
+        query = insert(Basket).values(UsersID=user_id, ProductID=product_id, Quantity=amount)
+        query = (
+            query.on_conflict_do_update(
+                index_elements=[Basket.UsersID, Basket.ProductID],
+                set_={"Quantity": Basket.__table__.c.Quantity + query.excluded.Quantity}
+            )
+            .returning(Basket.ProductID, Basket.Quantity)
+        )
+        try:
+            result = await self.session.execute(query)
+            row = result.one()
+            await self.session.commit()
+        except IntegrityError as e:
+            await self.session.rollback()
+            self._raise_for_foreign_key(e)
+            raise
+        return BasketItemQuantity(ProductID=row.ProductID, Quantity=row.Quantity)
+
+    async def decrement(self, user_id: int, product_id: int, amount: int = 1) -> BasketItemQuantity:
+        """Уменьшает количество товара; при достижении нуля удаляет его (Quantity = 0)"""
+        # Условия взаимоисключающие, обе ветки выполняются одним запросом
+        updated = (
+            update(Basket)
+            .where(Basket.UsersID == user_id)
+            .where(Basket.ProductID == product_id)
+            .where(Basket.Quantity > amount)
+            .values(Quantity=Basket.Quantity - amount)
+            .returning(Basket.Quantity)
+            .cte("updated")
+        )
+        deleted = (
+            delete(Basket)
+            .where(Basket.UsersID == user_id)
+            .where(Basket.ProductID == product_id)
+            .where(Basket.Quantity <= amount)
+            .returning(Basket.ProductID)
+            .cte("deleted")
+        )
+        query = union_all(
+            select(updated.c.Quantity),
+            select(literal(0, Integer)).select_from(deleted)
+        )
+        result = await self.session.execute(query)
+        quantity = result.scalar_one_or_none()
         await self.session.commit()
-        await self.session.refresh(basket_item)
-        return basket_item
+        if quantity is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Товар не найден в корзине"
+            )
+        return BasketItemQuantity(ProductID=product_id, Quantity=quantity)
 
-    async def get_user_basket(self, user_id: int) -> List[Basket]:
-        """Получает все товары в корзине пользователя"""
+    async def get_summary(self, user_id: int) -> BasketSummary:
+        """Считает число позиций, количество и сумму корзины одним агрегатным запросом"""
         result = await self.session.execute(
-            select(Basket)
+            select(
+                func.count(),
+                func.coalesce(func.sum(Basket.Quantity), 0),
+                func.coalesce(func.sum(Basket.Quantity * Product.Price), 0.0)
+            )
+            .select_from(Basket)
+            .join(Product, Product.ProductID == Basket.ProductID)
             .where(Basket.UsersID == user_id)
-            .options(selectinload(Basket.product))  # Загружаем связанный товар
         )
-        return result.scalars().all()
+        item_count, total_quantity, total_price = result.one()
+        return BasketSummary(ItemCount=item_count, TotalQuantity=total_quantity, TotalPrice=total_price)
+
+    async def get_user_basket(self, user_id: int) -> List[BasketItemWithProduct]:
+        """Получает все товары в корзине пользователя (строки Core, без ORM-сущностей)"""
+        return await fetch_basket_items(self.session, user_id)
 
     async def remove_from_basket(self, user_id: int, product_id: int) -> None:
         """Удаляет товар из корзины пользователя"""
@@ -0,0 +1,67 @@
+"""Построение вариантов для изображений, загруженных до появления конвейера.
+
+Запуск: python -m app.service.image_service.backfill [--batch-size N]
+"""
+import argparse
+import asyncio
+import logging
+from typing import Type, Union
+
+from sqlalchemy import func, or_, select
+
+from app.database.admission import Priority
+from app.database.database import admitted_session, dispose_engine
+from app.models.models import Product, User
+from app.service.image_service.image_pipeline import image_pipeline
+from app.settings.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+async def backfill_model(model: Type[Union[Product, User]], batch_size: int) -> int:
+    """Обрабатывает записи без вариантов пачками по первичному ключу"""
+    primary_key = model.ProductID if model is Product else model.UsersID
+    last_id = 0
+    processed = 0
+
+    while True:
+        async with admitted_session(Priority.LOW, settings.DB_BULK_STATEMENT_TIMEOUT_MS) as session:
+            result = await session.execute(
+                select(primary_key, model.Photo)
+                .where(model.Photo.isnot(None))
+                # Раньше сброс вариантов записывал JSON null вместо SQL NULL
+                .where(or_(model.PhotoVariants.is_(None), func.json_typeof(model.PhotoVariants) == "null"))
+                .where(primary_key > last_id)
+                .order_by(primary_key)
+                .limit(batch_size)
+            )
+            rows = result.all()
+        if not rows:
+            break
+
+        last_id = rows[-1][0]
+        photos = {photo for _, photo in rows}
+        results = await asyncio.gather(*(image_pipeline.process(model, photo) for photo in photos))
+        processed += sum(1 for variants in results if variants)
+        logger.info("%s: обработано %d фото (до id %d)", model.__tablename__, processed, last_id)
+
+    return processed
+
+
+async def main(batch_size: int) -> None:
+    image_pipeline.start()
+    try:
+        for model in (Product, User):
+            total = await backfill_model(model, batch_size)
+            logger.info("%s: готово, построены варианты для %d фото", model.__tablename__, total)
+    finally:
+        await image_pipeline.shutdown()
+        await dispose_engine()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Построение вариантов для уже загруженных изображений")
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    asyncio.run(main(args.batch_size))
@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Set, Type, Union
+
+from fastapi import HTTPException
+from sqlalchemy import update
+
+from app.database.admission import Priority
+from app.database.database import admitted_session
+from app.models.models import Product, User
+from app.service.invalidation_service import invalidation_bus
+from app.service.product_service.product_cache import product_cache
+from app.service.upload_service.upload_service import UploadService
+from app.settings.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Варианты изображения: имя -> максимальная сторона в пикселях (None - исходный размер)
+VARIANT_SIZES: Dict[str, Optional[int]] = {
+    "thumb": 320,
+    "medium": 960,
+    "full": None,
+}
+
+
+def variant_path(original: Path, name: str) -> Path:
+    """Путь варианта рядом с оригиналом: <имя>.<вариант>.webp"""
+    return original.with_name(f"{original.stem}.{name}.webp")
+
+
+def generate_variants(original_path: str, quality: int) -> Dict[str, str]:
+    """Строит WebP-варианты изображения. Выполняется в дочернем процессе."""
+    from PIL import Image, ImageOps
+
+    original = Path(original_path)
+    result = {}
+    with Image.open(original) as source:
+        image = ImageOps.exif_transpose(source)
+        has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+        for name, max_side in VARIANT_SIZES.items():
+            target = variant_path(original, name)
+            if not target.exists():
+                variant = image
+                if max_side is not None:
+                    variant = image.copy()
+                    variant.thumbnail((max_side, max_side), Image.LANCZOS)
+                tmp_path = target.with_name(f"{target.name}.part")
+                variant.save(tmp_path, "WEBP", quality=quality, method=4)
+                os.replace(tmp_path, target)
+            result[name] = target.name
+    return result
+
+
+class ImagePipeline:
+    """Фоновая генерация миниатюр и WebP-вариантов в пуле процессов.
+
+    Кодирование изображений занимает CPU, поэтому выполняется в отдельных
+    процессах. Готовые варианты записываются в поле PhotoVariants записи,
+    которой принадлежит фото.
+    """
+
+    def __init__(self):
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    def start(self) -> None:
+        if self._executor is None:
+            # spawn: дочерние процессы не наследуют потоки и соединения родителя
+            self._executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_PIPELINE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+
+    async def shutdown(self) -> None:
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def generate(self, original: Path) -> Dict[str, str]:
+        """Строит варианты файла и возвращает их URL по имени варианта"""
+        self.start()
+        loop = asyncio.get_running_loop()
+        names = await loop.run_in_executor(
+            self._executor, generate_variants, str(original), settings.IMAGE_PIPELINE_WEBP_QUALITY
+        )
+        relative_dir = original.parent.relative_to(settings.UPLOAD_ROOT).as_posix()
+        return {
+            name: UploadService.public_url(f"{relative_dir}/{file_name}" if relative_dir != "." else file_name)
+            for name, file_name in names.items()
+        }
+
+    def schedule(self, model: Type[Union[Product, User]], photo: Optional[str]) -> None:
+        """Ставит фото в очередь на обработку, не дожидаясь результата"""
+        if not photo:
+            return
+        task = asyncio.create_task(self.process(model, photo))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def process(self, model: Type[Union[Product, User]], photo: str) -> Optional[Dict[str, str]]:
+        """Строит варианты фото и сохраняет их у всех записей с этим фото"""
+        original = UploadService.local_path(photo)
+        if original is None or not original.is_file():
+            logger.warning("Файл для фото %s не найден", photo)
+            return None
+
+        try:
+            variants = await self.generate(original)
+        except Exception:
+            logger.exception("Не удалось построить варианты для %s", photo)
+            return None
+
+        try:
+            await self._record(model, photo, variants)
+        except HTTPException:
+            # Допуск к БД отклонен под нагрузкой: запись останется без вариантов до backfill
+            logger.warning("БД перегружена, варианты %s не сохранены", photo)
+            return None
+        return variants
+
+    async def _record(self, model: Type[Union[Product, User]], photo: str, variants: Dict[str, str]) -> None:
+        primary_key = model.ProductID if model is Product else model.UsersID
+        async with admitted_session(Priority.LOW, settings.DB_BULK_STATEMENT_TIMEOUT_MS) as session:
+            statement = update(model).where(model.Photo == photo).values(PhotoVariants=variants).returning(primary_key)
+            if model is Product:
+                statement = invalidation_bus.with_notify(statement, invalidation_bus.PRODUCT, "ProductID")
+            result = await session.execute(statement)
+            ids = [row[0] for row in result]
+            await session.commit()
+
+        if model is Product and ids:
+            product_cache.invalidate_products(ids)
+
+
+image_pipeline: ImagePipeline = ImagePipeline()
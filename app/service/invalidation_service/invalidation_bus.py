@@ -0,0 +1,121 @@
+"""Инвалидация кэшей процесса между воркерами через PostgreSQL LISTEN/NOTIFY.
+
+Писатель оборачивает свою запись в with_notify(): pg_notify выполняется тем же
+запросом, что и INSERT/UPDATE ... RETURNING, поэтому лишнего обращения к БД нет,
+а уведомление уходит только после COMMIT и не уходит при откате. Каждый воркер держит отдельное
+соединение с LISTEN и удаляет из своих кэшей указанные записи. Пока соединение
+было потеряно, уведомления могли не дойти, поэтому после переподключения
+кэши сбрасываются целиком.
+"""
+import asyncio
+import json
+import logging
+from typing import Optional
+
+import asyncpg
+from sqlalchemy import Select, Text, case, cast, func, literal, select, true
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+
+from app.service.product_service.product_cache import product_cache
+from app.settings.settings import settings
+
+logger = logging.getLogger(__name__)
+
+PRODUCT = "product"
+
+
+def with_notify(statement, kind: str, id_column: str) -> Select:
+    """Возвращает SELECT из statement (INSERT/UPDATE ... RETURNING или SELECT), который
+    в том же запросе отправляет уведомление об изменении записей с ID из колонки id_column.
+
+    pg_notify вызывается в некоррелированном подзапросе: он выполняется один раз
+    и только если запись вернула строки.
+    """
+    changed = statement.cte("changed")
+    if not settings.CACHE_INVALIDATION_ENABLED:
+        return select(changed)
+
+    ids = changed.c[id_column]
+    # Размер уведомления ограничен 8000 байт: при большом числе ID сбрасываем все
+    payload = case(
+        (
+            func.count() <= settings.CACHE_INVALIDATION_MAX_IDS,
+            func.json_build_object("kind", literal(kind), "ids", func.json_agg(aggregate_order_by(ids, ids))),
+        ),
+        else_=func.json_build_object("kind", literal(kind), "all", true()),
+    )
+    notify = select(func.pg_notify(settings.CACHE_INVALIDATION_CHANNEL, cast(payload, Text))).select_from(changed)
+    return select(changed, notify.scalar_subquery().label("notified"))
+
+
+def _apply(message: dict) -> None:
+    kind = message.get("kind")
+    ids = message.get("ids") or []
+    if kind == PRODUCT:
+        if message.get("all"):
+            product_cache.clear()
+        else:
+            product_cache.invalidate_products(ids)
+    else:
+        logger.warning("Неизвестное событие инвалидации: %s", message)
+
+
+class InvalidationListener:
+    """Отдельное соединение с LISTEN, переподключается при обрыве"""
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if settings.CACHE_INVALIDATION_ENABLED and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def _on_notification(self, connection, pid: int, channel: str, payload: str) -> None:
+        try:
+            _apply(json.loads(payload))
+        except Exception:
+            logger.exception("Не удалось обработать событие инвалидации: %s", payload)
+
+    async def _listen(self) -> None:
+        dsn = str(settings.db_url.with_scheme("postgresql"))
+        conn = await asyncpg.connect(dsn)
+        try:
+            closed = asyncio.Event()
+            conn.add_termination_listener(lambda _: closed.set())
+            await conn.add_listener(self.channel, self._on_notification)
+            # Все, что изменилось до подписки, могло быть пропущено
+            product_cache.clear()
+            logger.info("Подписка на %s установлена", self.channel)
+
+            while not closed.is_set():
+                try:
+                    await asyncio.wait_for(closed.wait(), timeout=settings.CACHE_INVALIDATION_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    # Без трафика обрыв соединения может остаться незамеченным
+                    await asyncio.wait_for(conn.execute("SELECT 1"), timeout=settings.DB_POOL_TIMEOUT)
+            raise ConnectionError("соединение закрыто сервером")
+        finally:
+            await conn.close(timeout=5)
+
+    async def _run(self) -> None:
+        delay = 1.0
+        while True:
+            try:
+                await self._listen()
+                delay = 1.0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Соединение LISTEN %s потеряно: %s; повтор через %.0f с", self.channel, e, delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+
+invalidation_listener: InvalidationListener = InvalidationListener(settings.CACHE_INVALIDATION_CHANNEL)
@@ -0,0 +1,94 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+from app.settings.settings import settings
+
+
+class ProductCache:
+    """Ограниченный LRU-кэш с TTL для уже сериализованных (JSON) ответов каталога.
+
+    Ключи имеют вид ``(kind, ...)``: ``("product", id)`` для карточки товара и
+    ``("page", ...)`` для страницы списка. Значения хранятся готовыми байтами,
+    поэтому попадание в кэш не требует ни запроса к БД, ни работы Pydantic.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, bytes]]" = OrderedDict()
+        # Поколение растет при каждой инвалидации: ответ, прочитанный из БД
+        # до инвалидации, не должен попасть в кэш после нее
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: bytes, generation: Optional[int] = None) -> None:
+        if self.max_entries <= 0:
+            return
+        if generation is not None and generation != self.generation:
+            return
+
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate_products(self, product_ids: Iterable[int]) -> None:
+        """Удаляет карточки товаров и все страницы списков"""
+        for product_id in product_ids:
+            self._entries.pop(("product", product_id), None)
+        self.invalidate_kind("page")
+
+    def invalidate_kind(self, kind: str) -> None:
+        """Удаляет все записи одного вида, например все страницы списков"""
+        self.generation += 1
+        self.invalidations += 1
+        for key in [key for key in self._entries if key[0] == kind]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self.generation += 1
+        self.invalidations += 1
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+product_cache: ProductCache = ProductCache(
+    max_entries=settings.PRODUCT_CACHE_MAX_ENTRIES,
+    ttl=settings.PRODUCT_CACHE_TTL,
+)
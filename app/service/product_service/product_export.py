@@ -0,0 +1,68 @@
+"""Потоковая выгрузка каталога в NDJSON или CSV.
+
+Строки читаются серверным курсором пачками по PRODUCT_EXPORT_CHUNK_ROWS и сразу
+отдаются клиенту, поэтому память не растет с размером таблицы, а первый байт
+уходит после первой пачки.
+"""
+import csv
+import io
+import json
+import zlib
+from typing import AsyncIterator, Iterable
+
+import orjson
+from sqlalchemy import Row
+
+from app.database.admission import Priority
+from app.database.database import admitted_connection
+from app.queries.product.product_queries import PRODUCT_COLUMNS, products, select_products
+from app.schemas.product.product_schemas import CatalogFormat
+from app.settings.settings import settings
+
+CSV_HEADER = [column.name for column in PRODUCT_COLUMNS]
+
+MEDIA_TYPES = {
+    CatalogFormat.ndjson: "application/x-ndjson",
+    CatalogFormat.csv: "text/csv; charset=utf-8",
+}
+
+
+def _ndjson_chunk(rows: Iterable[Row]) -> bytes:
+    return b"".join(orjson.dumps(row._asdict()) + b"\n" for row in rows)
+
+
+def _csv_chunk(rows: Iterable[Row]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        variants = row.PhotoVariants
+        writer.writerow([*row[:-1], json.dumps(variants) if variants is not None else ""])
+    return buffer.getvalue().encode()
+
+
+async def export_products(fmt: CatalogFormat) -> AsyncIterator[bytes]:
+    """Отдает каталог кусками; каждый кусок соответствует одной пачке строк курсора"""
+    encode = _csv_chunk if fmt == CatalogFormat.csv else _ndjson_chunk
+
+    # Собственное соединение: зависимости запроса закрываются до отправки тела ответа.
+    # Выгрузка - младший класс допуска к БД с собственным statement_timeout
+    async with admitted_connection(Priority.LOW, settings.DB_BULK_STATEMENT_TIMEOUT_MS) as conn:
+        if fmt == CatalogFormat.csv:
+            yield (",".join(CSV_HEADER) + "\r\n").encode()
+        result = await conn.stream(
+            select_products()
+            .order_by(products.c.ProductID)
+            .execution_options(yield_per=settings.PRODUCT_EXPORT_CHUNK_ROWS)
+        )
+        async for rows in result.partitions():
+            yield encode(rows)
+
+
+async def gzip_stream(chunks: AsyncIterator[bytes], level: int = settings.PRODUCT_EXPORT_GZIP_LEVEL) -> AsyncIterator[bytes]:
+    """Сжимает поток в формат gzip, сбрасывая буфер после каждого куска"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
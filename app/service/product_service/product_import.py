@@ -0,0 +1,399 @@
+"""Массовый импорт товаров из CSV или NDJSON.
+
+Строки читаются потоком, проверяются ProductImportRow и пачками загружаются
+через COPY во временную таблицу, откуда одним запросом обновляются
+существующие товары и добавляются новые. В памяти держится только текущая пачка.
+
+Запуск: python -m app.service.product_service.product_import catalog.csv [--format csv|ndjson]
+"""
+import argparse
+import asyncio
+import codecs
+import csv
+import json
+import logging
+import tempfile
+from pathlib import Path
+from typing import IO, Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+from pydantic import ValidationError
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, delete, literal, select, union_all, update
+from sqlalchemy.ext.asyncio import AsyncConnection
+from starlette.concurrency import run_in_threadpool
+
+from app.database.admission import Priority
+from app.database.database import admitted_connection, dispose_engine
+from app.queries.product.product_queries import products
+from app.schemas.product.product_schemas import CatalogFormat, ProductImportRow
+from app.service.invalidation_service import invalidation_bus
+from app.service.product_service.product_cache import product_cache
+from app.settings.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Промежуточная таблица живет в соединении импорта и очищается при каждом коммите
+staging = Table(
+    "products_import",
+    MetaData(),
+    Column("Line", Integer),
+    Column("ProductID", Integer),
+    Column("Name", String(100)),
+    Column("Price", Float),
+    Column("Description", String(500)),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DELETE ROWS",
+)
+
+STAGING_COLUMNS = [column.name for column in staging.columns]
+REQUIRED_CSV_COLUMNS = ("Name", "Price")
+
+# Строка источника: номер строки, данные или текст ошибки разбора
+ParsedRow = Tuple[int, Optional[Any], Optional[str]]
+
+
+class _LineSplitter:
+    """Делит декодированный текст на строки, разбирая только новый кусок.
+
+    Незаконченная строка хранится частями; строка длиннее max_length заменяется
+    на None, а ее остаток до перевода строки пропускается без накопления.
+    """
+
+    def __init__(self, max_length: int):
+        self.max_length = max_length
+        self._parts: List[str] = []
+        self._size = 0
+        self._oversize = False
+
+    def _take(self, line: Optional[str]) -> Optional[str]:
+        result = None if self._oversize or line is None else "".join(self._parts + [line]).rstrip("\r")
+        self._parts, self._size, self._oversize = [], 0, False
+        return result
+
+    def feed(self, text: str) -> List[Optional[str]]:
+        *lines, tail = text.split("\n")
+        result = []
+        for line in lines:
+            too_long = self._size + len(line) > self.max_length
+            result.append(self._take(None if too_long else line))
+        if not self._oversize:
+            self._parts.append(tail)
+            self._size += len(tail)
+            if self._size > self.max_length:
+                self._parts, self._size, self._oversize = [], 0, True
+        return result
+
+    def finish(self) -> List[Optional[str]]:
+        if not self._oversize and not self._size:
+            return []
+        return [self._take("")]
+
+
+async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Optional[str]]:
+    """Строки источника; None - строка длиннее PRODUCT_IMPORT_MAX_LINE_CHARS"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    splitter = _LineSplitter(settings.PRODUCT_IMPORT_MAX_LINE_CHARS)
+    async for chunk in chunks:
+        for line in splitter.feed(decoder.decode(chunk)):
+            yield line
+    for line in splitter.feed(decoder.decode(b"", final=True)) + splitter.finish():
+        yield line
+
+
+def _oversize_error() -> str:
+    return f"Строка длиннее {settings.PRODUCT_IMPORT_MAX_LINE_CHARS} символов"
+
+
+async def _iter_ndjson(lines: AsyncIterator[Optional[str]]) -> AsyncIterator[ParsedRow]:
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        if line is None:
+            yield line_no, None, _oversize_error()
+            continue
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line), None
+        except ValueError:
+            yield line_no, None, "Некорректный JSON"
+
+
+class _CsvRecords:
+    """Собирает записи CSV из строк по мере их поступления.
+
+    Кавычки разбирает csv.reader в строгом режиме: пока поле в кавычках не закрыто,
+    он сообщает о неожиданном конце данных, и запись продолжается на следующей строке.
+    Кавычка внутри поля без кавычек (5" shoe) остается обычным символом. Запись длиннее
+    MAX_RECORD_LINES строк считается незакрытой кавычкой: об ошибке сообщается для ее
+    первой строки, а разбор продолжается со следующей.
+    """
+
+    MAX_RECORD_LINES = 100
+
+    def __init__(self):
+        self.header: Optional[List[str]] = None
+        self._lines: List[Tuple[int, str]] = []
+
+    def feed(self, line_no: int, line: str) -> List[ParsedRow]:
+        self._lines.append((line_no, line))
+        return self._parse()
+
+    def oversize(self, line_no: int) -> List[ParsedRow]:
+        """Слишком длинная строка отклоняет всю запись, которой она принадлежит"""
+        if self.header is None:
+            raise ValueError(f"Заголовок: {_oversize_error()}")
+        start = self._lines[0][0] if self._lines else line_no
+        self._lines = []
+        return [(start, None, _oversize_error())]
+
+    def finish(self) -> List[ParsedRow]:
+        rows: List[ParsedRow] = []
+        while self._lines:
+            rows.append((self._lines[0][0], None, "Незакрытые кавычки"))
+            rows.extend(self._restart())
+        return rows
+
+    def _restart(self) -> List[ParsedRow]:
+        # Первая строка отброшена, остальные разбираются заново
+        pending = self._lines[1:]
+        self._lines = []
+        rows: List[ParsedRow] = []
+        for line_no, line in pending:
+            rows.extend(self.feed(line_no, line))
+        return rows
+
+    def _parse(self) -> List[ParsedRow]:
+        start = self._lines[0][0]
+        reader = csv.reader((line + "\n" for _, line in self._lines), strict=True)
+        try:
+            values = next(reader, [])
+        except csv.Error as e:
+            if "unexpected end of data" not in str(e):
+                self._lines = []
+                return [(start, None, f"Некорректная строка CSV: {e}")]
+            if len(self._lines) <= self.MAX_RECORD_LINES:
+                return []
+            return [(start, None, "Незакрытые кавычки")] + self._restart()
+
+        self._lines = []
+        if len(values) <= 1 and not "".join(values).strip():
+            return []
+        return self._record(start, values)
+
+    def _record(self, start: int, values: List[str]) -> List[ParsedRow]:
+        if self.header is None:
+            self.header = [name.strip() for name in values]
+            missing = [name for name in REQUIRED_CSV_COLUMNS if name not in self.header]
+            if missing:
+                raise ValueError(f"В заголовке нет колонок: {', '.join(missing)}")
+            return []
+        if len(values) != len(self.header):
+            return [(start, None, f"Ожидалось полей: {len(self.header)}, получено: {len(values)}")]
+        return [(start, {name: value if value != "" else None for name, value in zip(self.header, values)}, None)]
+
+
+async def _iter_csv(lines: AsyncIterator[Optional[str]]) -> AsyncIterator[ParsedRow]:
+    """Разбирает CSV с заголовком; поле в кавычках может занимать несколько строк"""
+    records = _CsvRecords()
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        for row in records.feed(line_no, line) if line is not None else records.oversize(line_no):
+            yield row
+    for row in records.finish():
+        yield row
+
+
+def _validation_errors(error: ValidationError) -> List[str]:
+    return [
+        f"{'.'.join(str(part) for part in item['loc']) or 'row'}: {item['msg']}"
+        for item in error.errors()
+    ]
+
+
+async def _upsert_batch(conn: AsyncConnection, records: List[tuple]) -> Tuple[List[int], List[int], List[int]]:
+    """Загружает пачку через COPY и переносит ее в Products.
+
+    Возвращает ID обновленных и созданных товаров и номера строк, чей ProductID не найден.
+    """
+    # Первый запрос открывает транзакцию драйвера, иначе COPY выполнится вне ее
+    # и ON COMMIT DELETE ROWS сразу очистит таблицу
+    await conn.execute(delete(staging))
+    raw = await conn.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(
+        staging.name, records=records, columns=STAGING_COLUMNS
+    )
+
+    missing = await conn.execute(
+        select(staging.c.Line)
+        .where(staging.c.ProductID.isnot(None))
+        .where(~select(products.c.ProductID).where(products.c.ProductID == staging.c.ProductID).exists())
+        .order_by(staging.c.Line)
+    )
+    missing_lines = list(missing.scalars())
+
+    updated = (
+        update(products)
+        .values(Name=staging.c.Name, Price=staging.c.Price, Description=staging.c.Description)
+        .where(products.c.ProductID == staging.c.ProductID)
+        .returning(products.c.ProductID)
+        .cte("updated")
+    )
+    inserted = (
+        products.insert()
+        .from_select(
+            ["Name", "Price", "Description"],
+            select(staging.c.Name, staging.c.Price, staging.c.Description)
+            .where(staging.c.ProductID.is_(None))
+            .order_by(staging.c.Line)
+        )
+        .returning(products.c.ProductID)
+        .cte("inserted")
+    )
+    result = await conn.execute(
+        invalidation_bus.with_notify(
+            union_all(
+                select(updated.c.ProductID, literal(True).label("updated")),
+                select(inserted.c.ProductID, literal(False).label("updated")),
+            ),
+            invalidation_bus.PRODUCT,
+            "ProductID"
+        )
+    )
+    updated_ids: List[int] = []
+    inserted_ids: List[int] = []
+    for row in result:
+        (updated_ids if row.updated else inserted_ids).append(row.ProductID)
+    return updated_ids, inserted_ids, missing_lines
+
+
+async def import_products(
+    chunks: AsyncIterator[bytes],
+    fmt: CatalogFormat,
+    batch_size: int = settings.PRODUCT_IMPORT_BATCH_SIZE
+) -> AsyncIterator[Dict[str, Any]]:
+    """Импортирует товары и по ходу работы отдает события.
+
+    События: ``error`` для отклоненной строки, ``progress`` после каждой
+    записанной пачки, ``done`` в конце. Каждая пачка коммитится отдельно,
+    ошибка базы отклоняет только свою пачку.
+    """
+    totals = {"rows": 0, "inserted": 0, "updated": 0, "rejected": 0}
+    parse = _iter_csv if fmt == CatalogFormat.csv else _iter_ndjson
+
+    async with admitted_connection(Priority.LOW, settings.DB_BULK_STATEMENT_TIMEOUT_MS) as conn:
+        await conn.run_sync(staging.create, checkfirst=True)
+        await conn.commit()
+
+        async def flush(records: List[tuple]):
+            try:
+                updated_ids, inserted_ids, missing_lines = await _upsert_batch(conn, records)
+                await conn.commit()
+            except Exception as e:
+                await conn.rollback()
+                totals["rejected"] += len(records)
+                logger.warning("Пачка импорта отклонена (строки %d-%d): %s", records[0][0], records[-1][0], e)
+                yield {"event": "error", "lines": [records[0][0], records[-1][0]], "errors": [str(e)]}
+                return
+
+            product_cache.invalidate_products(updated_ids)
+            totals["updated"] += len(updated_ids)
+            totals["inserted"] += len(inserted_ids)
+            totals["rejected"] += len(missing_lines)
+            for line in missing_lines:
+                yield {"event": "error", "line": line, "errors": ["ProductID: товар не найден"]}
+            yield {"event": "progress", **totals}
+
+        records: List[tuple] = []
+        try:
+            async for line, data, error in parse(_iter_lines(chunks)):
+                totals["rows"] += 1
+                if error is None:
+                    try:
+                        row = ProductImportRow.model_validate(data)
+                    except ValidationError as e:
+                        errors = _validation_errors(e)
+                    else:
+                        records.append((line, row.ProductID, row.Name, row.Price, row.Description))
+                        errors = None
+                else:
+                    errors = [error]
+
+                if errors:
+                    totals["rejected"] += 1
+                    yield {"event": "error", "line": line, "errors": errors}
+                if len(records) >= batch_size:
+                    async for event in flush(records):
+                        yield event
+                    records = []
+
+            if records:
+                async for event in flush(records):
+                    yield event
+        except (UnicodeDecodeError, ValueError) as e:
+            yield {"event": "error", "fatal": True, "errors": [str(e)]}
+        finally:
+            await conn.rollback()
+            await conn.run_sync(staging.drop, checkfirst=True)
+            await conn.commit()
+
+    yield {"event": "done", **totals}
+
+
+async def spool_request_body(request: Request) -> IO[bytes]:
+    """Сохраняет тело запроса во временный файл.
+
+    StreamingResponse сам читает receive(), поэтому тело нужно дочитать до ответа.
+    """
+    spool = tempfile.TemporaryFile()
+    size = 0
+    try:
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > settings.PRODUCT_IMPORT_MAX_BYTES:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"Файл больше допустимых {settings.PRODUCT_IMPORT_MAX_BYTES // (1024 * 1024)} МБ"
+                )
+            await run_in_threadpool(spool.write, chunk)
+        await run_in_threadpool(spool.seek, 0)
+    except BaseException:
+        spool.close()
+        raise
+    return spool
+
+
+async def read_chunks(file: IO[bytes], chunk_size: int = settings.UPLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Читает файл кусками в пуле потоков и закрывает его в конце"""
+    try:
+        while chunk := await run_in_threadpool(file.read, chunk_size):
+            yield chunk
+    finally:
+        file.close()
+
+
+async def main(path: Path, fmt: CatalogFormat, batch_size: int) -> None:
+    try:
+        async for event in import_products(read_chunks(path.open("rb")), fmt, batch_size):
+            if event["event"] == "error":
+                logger.warning("Строка %s: %s", event.get("line", event.get("lines")), "; ".join(event["errors"]))
+            else:
+                logger.info(
+                    "%s: строк %d, добавлено %d, обновлено %d, отклонено %d",
+                    event["event"], event["rows"], event["inserted"], event["updated"], event["rejected"]
+                )
+    finally:
+        await dispose_engine()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Массовый импорт товаров из CSV или NDJSON")
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--format", choices=[f.value for f in CatalogFormat], default=None,
+                        help="по умолчанию определяется по расширению файла")
+    parser.add_argument("--batch-size", type=int, default=settings.PRODUCT_IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+    fmt = CatalogFormat(args.format or ("csv" if args.path.suffix.lower() == ".csv" else "ndjson"))
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    asyncio.run(main(args.path, fmt, args.batch_size))
@@ -0,0 +1,84 @@
+import asyncio
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import Integer, any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from app.database.admission import Priority
+from app.database.database import admitted_session
+from app.queries.product.product_queries import products, select_products
+from app.schemas.product.product_schemas import ProductResponse
+from app.service.product_service.product_cache import product_cache
+from app.settings.settings import settings
+
+
+class ProductLoader:
+    """Загрузка товаров по ID с объединением запросов (single-flight + DataLoader).
+
+    Одновременные запросы одного и того же товара ждут один общий запрос к БД.
+    Все ID, запрошенные за одну итерацию цикла событий, загружаются одним
+    ``WHERE ProductID = ANY(...)``. Загрузчик общий для процесса и использует
+    собственные сессии основной БД, а не сессию запроса: его результаты
+    попадают в product_cache, а отстающая реплика вернула бы туда старые строки.
+    Общий запрос занимает одно место в admission как просмотр каталога.
+
+    Вместе с товаром возвращается поколение product_cache на момент отправки
+    запроса: ожидающий мог прийти раньше инвалидации, а запрос уйти позже нее.
+    """
+
+    def __init__(self, max_batch_size: int):
+        self.max_batch_size = max_batch_size
+        self._inflight: Dict[int, asyncio.Future] = {}
+        self._queue: List[int] = []
+        self._dispatch_scheduled = False
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def load(self, product_id: int) -> Tuple[Optional[ProductResponse], int]:
+        """Товар по ID (или None, если его нет) и поколение кэша, с которым его можно сохранить"""
+        future = self._inflight.get(product_id)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._inflight[product_id] = future
+            self._queue.append(product_id)
+            if not self._dispatch_scheduled:
+                self._dispatch_scheduled = True
+                loop.call_soon(self._dispatch)
+        # shield: отмена одного ожидающего не отменяет общий запрос для остальных
+        return await asyncio.shield(future)
+
+    async def load_many(self, product_ids: List[int]) -> List[Tuple[Optional[ProductResponse], int]]:
+        return list(await asyncio.gather(*(self.load(product_id) for product_id in product_ids)))
+
+    def _dispatch(self) -> None:
+        self._dispatch_scheduled = False
+        queue, self._queue = self._queue, []
+        generation = product_cache.generation
+        for start in range(0, len(queue), self.max_batch_size):
+            task = asyncio.create_task(self._fetch(queue[start:start + self.max_batch_size], generation))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _fetch(self, product_ids: List[int], generation: int) -> None:
+        try:
+            async with admitted_session(Priority.LOW, settings.DB_CATALOG_STATEMENT_TIMEOUT_MS) as session:
+                result = await session.execute(
+                    select_products().where(
+                        products.c.ProductID == any_(bindparam("product_ids", product_ids, type_=ARRAY(Integer)))
+                    )
+                )
+                found = {row.ProductID: ProductResponse.model_validate(row) for row in result}
+        except Exception as e:
+            for product_id in product_ids:
+                future = self._inflight.pop(product_id)
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for product_id in product_ids:
+            future = self._inflight.pop(product_id)
+            if not future.done():
+                future.set_result((found.get(product_id), generation))
+
+
+product_loader: ProductLoader = ProductLoader(max_batch_size=settings.PRODUCT_LOADER_MAX_BATCH)
@@ -1,17 +1,96 @@
-import os
-import uuid
+import base64
+import binascii
+import json
+import math
 from fastapi import UploadFile, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, func, tuple_, and_, or_, literal_column
 from app.models.models import Product
-from typing import Optional
-from pathlib import Path
+from app.schemas.product.product_schemas import (
+    ProductPage,
+    ProductResponse,
+    ProductSort,
+    ProductSuggestion
+)
+from app.service.product_service.product_cache import product_cache
+from app.service.product_service.product_loader import product_loader
+from app.service.upload_service.upload_service import UploadService, IMAGE_EXTENSIONS
+from app.service.image_service.image_pipeline import image_pipeline
+from app.service.invalidation_service import invalidation_bus
+from app.queries.product.product_queries import PRODUCT_COLUMNS, products, select_products
+from typing import List, Optional
+
+# Порядок сортировки для каждого варианта; ProductID всегда последний для однозначности
+_ORDERING = {
+    ProductSort.id_asc: (products.c.ProductID.asc(),),
+    ProductSort.id_desc: (products.c.ProductID.desc(),),
+    ProductSort.price_asc: (products.c.Price.asc(), products.c.ProductID.asc()),
+    ProductSort.price_desc: (products.c.Price.desc(), products.c.ProductID.desc()),
+}
+
+
+def _cursor_key(sort: ProductSort, row) -> list:
+    if sort in (ProductSort.price_asc, ProductSort.price_desc):
+        return [row.Price, row.ProductID]
+    return [row.ProductID]
+
+
+def _encode_cursor(kind: str, key: list) -> str:
+    """Кодирует позицию последнего товара страницы в непрозрачный курсор"""
+    raw = json.dumps({"s": kind, "k": key}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _is_id(value) -> bool:
+    # bool - подкласс int, а ID за пределами INTEGER вернул бы ошибку БД вместо 400
+    return type(value) is int and -2**31 <= value < 2**31
+
+
+def _is_sort_value(value) -> bool:
+    # Цена и ранг поиска; json.loads пропускает NaN и Infinity
+    return type(value) in (int, float) and math.isfinite(value)
+
+
+def _decode_cursor(cursor: str, kind: str, key_length: int) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        key = data["k"]
+        valid = (
+            data["s"] == kind and isinstance(key, list) and len(key) == key_length
+            and all(_is_sort_value(value) for value in key[:-1]) and _is_id(key[-1])
+        )
+    except (binascii.Error, ValueError, TypeError, KeyError, OverflowError):
+        valid = False
+    if not valid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор"
+        )
+    return key
+
+
+def _after_cursor(sort: ProductSort, key: list):
+    """Условие keyset-пагинации: строки строго после позиции курсора"""
+    if sort == ProductSort.id_asc:
+        return products.c.ProductID > key[0]
+    if sort == ProductSort.id_desc:
+        return products.c.ProductID < key[0]
+    if sort == ProductSort.price_asc:
+        return tuple_(products.c.Price, products.c.ProductID) > tuple_(key[0], key[1])
+    return tuple_(products.c.Price, products.c.ProductID) < tuple_(key[0], key[1])
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+# Конфигурация полнотекстового поиска должна совпадать с генерируемой колонкой SearchVector
+_SEARCH_CONFIG = literal_column("'simple'::regconfig")
 
 class ProductService:
     def __init__(self, session: AsyncSession):
         self.session = session
-        self.upload_dir = "uploads/products"
-        Path(self.upload_dir).mkdir(parents=True, exist_ok=True)
 
     async def _save_image(self, file: UploadFile) -> str:
         """Сохраняет изображение товара и возвращает полный URL"""
@@ -21,26 +100,8 @@ class ProductService:
                 detail="Поддерживаются только изображения"
             )
 
-        file_ext = Path(file.filename).suffix.lower()
-        if file_ext not in ['.png', '.jpg', '.jpeg']:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Неподдерживаемый формат изображения"
-            )
-
-        filename = f"{uuid.uuid4()}{file_ext}"
-        file_path = Path(self.upload_dir) / filename
-
-        try:
-            with open(file_path, "wb") as buffer:
-                content = await file.read()
-                buffer.write(content)
-            return f"http://212.20.53.169:1211/uploads/products/{filename}"
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Ошибка при сохранении изображения: {str(e)}"
-            )
+        relative_path = await UploadService("products").save_image(file, IMAGE_EXTENSIONS)
+        return UploadService.public_url(relative_path)
     
     async def create_product(
         self,
@@ -48,34 +109,168 @@ class ProductService:
         price: float,
         description: Optional[str] = None,
         image: UploadFile = None
-    ) -> Product:
+    ) -> ProductResponse:
         """Создает новый товар с изображением"""
         image_url = await self._save_image(image) if image else None
 
-        product = Product(
-            Name=name,
-            Price=price,
-            Description=description,
-            Photo=image_url
+        # INSERT ... RETURNING вместо commit + refresh: один запрос на запись, в нем же
+        # уведомление, по которому остальные воркеры сбросят страницы списка после коммита
+        result = await self.session.execute(
+            invalidation_bus.with_notify(
+                products.insert()
+                .values(Name=name, Price=price, Description=description, Photo=image_url)
+                .returning(*PRODUCT_COLUMNS),
+                invalidation_bus.PRODUCT,
+                "ProductID"
+            )
         )
-
-        self.session.add(product)
+        product = ProductResponse.model_validate(result.one())
         await self.session.commit()
-        await self.session.refresh(product)
+        # Новый товар меняет состав страниц списка
+        product_cache.invalidate_kind("page")
+        image_pipeline.schedule(Product, image_url)
         return product
 
 
-    async def get_product(self, product_id: int) -> Product:
-        """Получает товар по ID"""
-        product = await self.session.get(Product, product_id)
-        if not product:
+    @staticmethod
+    async def get_product_json(product_id: int) -> bytes:
+        """Возвращает карточку товара как готовый JSON, по возможности из кэша"""
+        key = ("product", product_id)
+        cached = product_cache.get(key)
+        if cached is not None:
+            return cached
+
+        # Одновременные запросы одного товара объединяются загрузчиком
+        product, generation = await product_loader.load(product_id)
+        if product is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Товар не найден"
             )
-        return product
+        body = product.model_dump_json().encode()
+        product_cache.set(key, body, generation)
+        return body
+
+    @staticmethod
+    async def get_products_batch_json(product_ids: List[int]) -> bytes:
+        """Возвращает несколько товаров одним ответом; готовый JSON из кэша склеивается как есть"""
+        product_ids = list(dict.fromkeys(product_ids))
+        bodies = {}
+        misses = []
+        for product_id in product_ids:
+            cached = product_cache.get(("product", product_id))
+            if cached is None:
+                misses.append(product_id)
+            else:
+                bodies[product_id] = cached
+
+        if misses:
+            for product_id, (product, generation) in zip(misses, await product_loader.load_many(misses)):
+                if product is not None:
+                    body = product.model_dump_json().encode()
+                    product_cache.set(("product", product_id), body, generation)
+                    bodies[product_id] = body
+
+        items = b",".join(bodies[product_id] for product_id in product_ids if product_id in bodies)
+        missing = json.dumps([product_id for product_id in product_ids if product_id not in bodies])
+        return b'{"items":[' + items + b'],"missing":' + missing.encode() + b"}"
+
+    async def get_all_products_json(
+        self,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        name_prefix: Optional[str] = None,
+        sort: ProductSort = ProductSort.id_asc
+    ) -> bytes:
+        """Возвращает страницу товаров как готовый JSON, по возможности из кэша"""
+        key = ("page", limit, cursor, min_price, max_price, name_prefix, sort.value)
+        cached = product_cache.get(key)
+        if cached is not None:
+            return cached
+
+        generation = product_cache.generation
+        page = await self.get_all_products(
+            limit=limit,
+            cursor=cursor,
+            min_price=min_price,
+            max_price=max_price,
+            name_prefix=name_prefix,
+            sort=sort
+        )
+        body = page.model_dump_json().encode()
+        # Страница с отстающей реплики могла бы вернуть в кэш данные до инвалидации
+        if not self.session.info.get("replica"):
+            product_cache.set(key, body, generation)
+        return body
+
+    async def get_all_products(
+        self,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        name_prefix: Optional[str] = None,
+        sort: ProductSort = ProductSort.id_asc
+    ) -> ProductPage:
+        """Получает страницу товаров с фильтрами (keyset-пагинация по курсору)"""
+        query = select_products()
+        if min_price is not None:
+            query = query.where(products.c.Price >= min_price)
+        if max_price is not None:
+            query = query.where(products.c.Price <= max_price)
+        if name_prefix:
+            query = query.where(func.lower(products.c.Name).like(_escape_like(name_prefix.lower()) + "%"))
+        if cursor:
+            query = query.where(_after_cursor(sort, _decode_cursor(cursor, sort.value, len(_ORDERING[sort]))))
+
+        # Берем на одну строку больше, чтобы понять, есть ли следующая страница
+        query = query.order_by(*_ORDERING[sort]).limit(limit + 1)
+        result = await self.session.execute(query)
+        rows = result.all()
+
+        items = rows[:limit]
+        next_cursor = _encode_cursor(sort.value, _cursor_key(sort, items[-1])) if len(rows) > limit else None
+        return ProductPage(
+            items=[ProductResponse.model_validate(row) for row in items],
+            next_cursor=next_cursor
+        )
 
-    async def get_all_products(self) -> list[Product]:
-        """Получает все товары"""
-        result = await self.session.execute(select(Product))
-        return result.scalars().all()
\ No newline at end of file
+    async def search(self, query: str, limit: int = 20, cursor: Optional[str] = None) -> ProductPage:
+        """Полнотекстовый поиск по названию и описанию, по убыванию релевантности"""
+        tsquery = func.websearch_to_tsquery(_SEARCH_CONFIG, query)
+        rank = func.ts_rank_cd(products.c.SearchVector, tsquery)
+
+        statement = select_products(rank.label("rank")).where(products.c.SearchVector.op("@@")(tsquery))
+        if cursor:
+            last_rank, last_id = _decode_cursor(cursor, "search", 2)
+            statement = statement.where(
+                or_(rank < last_rank, and_(rank == last_rank, products.c.ProductID > last_id))
+            )
+        statement = statement.order_by(rank.desc(), products.c.ProductID.asc()).limit(limit + 1)
+
+        result = await self.session.execute(statement)
+        rows = result.all()
+        items = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = _encode_cursor("search", [items[-1].rank, items[-1].ProductID])
+        return ProductPage(
+            items=[ProductResponse.model_validate(row) for row in items],
+            next_cursor=next_cursor
+        )
+
+    async def suggest(self, query: str, limit: int = 10) -> list[ProductSuggestion]:
+        """Подсказки по названию с учетом опечаток (pg_trgm)"""
+        similarity = func.similarity(products.c.Name, query)
+        result = await self.session.execute(
+            select(products.c.ProductID, products.c.Name)
+            .where(or_(
+                products.c.Name.ilike(f"%{_escape_like(query)}%"),
+                products.c.Name.op("%")(query)
+            ))
+            .order_by(similarity.desc(), products.c.ProductID.asc())
+            .limit(limit)
+        )
+        return [ProductSuggestion(ProductID=row.ProductID, Name=row.Name) for row in result]
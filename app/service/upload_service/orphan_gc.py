@@ -0,0 +1,139 @@
+"""Удаление файлов в каталоге загрузок, на которые не ссылается ни одна запись.
+
+Файл считается используемым, если его URL (или путь uploads/...) записан в
+Users.Photo или Products.Photo. Варианты <имя>.<вариант>.webp живут, пока
+живет оригинал. Каталог обходится потоково, проверка в БД идет пачками.
+
+Запуск: python -m app.service.upload_service.orphan_gc [--dry-run] [--batch-size N] [--min-age SEC]
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set
+
+from sqlalchemy import select, union_all
+
+from app.database.admission import Priority
+from app.database.database import admitted_session, dispose_engine
+from app.models.models import Product, User
+from app.service.image_service.image_pipeline import VARIANT_SIZES
+from app.service.upload_service.upload_service import UploadService
+from app.settings.settings import settings
+
+logger = logging.getLogger(__name__)
+
+ORIGINAL_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".webp")
+
+
+def iter_files(root: Path) -> Iterator[os.DirEntry]:
+    """Обходит дерево каталогов без загрузки списков файлов целиком"""
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(Path(entry.path))
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry
+
+
+def original_of(path: Path) -> Optional[Path]:
+    """Оригинал для файла-варианта; None, если файл сам является оригиналом"""
+    parts = path.name.split(".")
+    if len(parts) != 3 or parts[1] not in VARIANT_SIZES:
+        return None
+    for extension in ORIGINAL_EXTENSIONS:
+        candidate = path.with_name(f"{parts[0]}{extension}")
+        if candidate.exists():
+            return candidate
+    # Оригинала нет - вариант ссылается сам на себя и будет удален как сирота
+    return path
+
+
+def photo_values(path: Path) -> List[str]:
+    """Значения поля Photo, которые могут ссылаться на файл"""
+    relative_path = path.relative_to(settings.UPLOAD_ROOT).as_posix()
+    return [UploadService.public_url(relative_path), f"{settings.UPLOAD_ROOT}/{relative_path}"]
+
+
+def _is_fresh(path: Path, deadline: float) -> bool:
+    try:
+        return path.stat().st_mtime > deadline
+    except FileNotFoundError:
+        return False
+
+
+async def referenced_photos(values: List[str]) -> Set[str]:
+    query = union_all(
+        select(User.Photo).where(User.Photo.in_(values)),
+        select(Product.Photo).where(Product.Photo.in_(values)),
+    )
+    async with admitted_session(Priority.LOW, settings.DB_BULK_STATEMENT_TIMEOUT_MS) as session:
+        result = await session.execute(query)
+        return set(result.scalars().all())
+
+
+async def collect_batch(entries: List[os.DirEntry], min_age: float, dry_run: bool) -> int:
+    """Удаляет сирот из одной пачки файлов, возвращает число удаленных"""
+    deadline = time.time() - min_age
+    owners: Dict[Path, Path] = {}
+    for entry in entries:
+        # Свежие файлы пропускаем: запись в БД может быть еще не закоммичена
+        if entry.stat(follow_symlinks=False).st_mtime > deadline:
+            continue
+        path = Path(entry.path)
+        if path.suffix == ".part":
+            owners[path] = path
+            continue
+        owners[path] = original_of(path) or path
+
+    originals = {owner for owner in owners.values() if owner.suffix != ".part"}
+    values = [value for original in originals for value in photo_values(original)]
+    referenced = await referenced_photos(values) if values else set()
+    alive = {
+        original for original in originals
+        if referenced.intersection(photo_values(original)) or _is_fresh(original, deadline)
+    }
+
+    removed = 0
+    for path, owner in owners.items():
+        if owner in alive:
+            continue
+        logger.info("%s %s", "Сирота" if dry_run else "Удален", path)
+        if not dry_run:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                continue
+        removed += 1
+    return removed
+
+
+async def main(batch_size: int, min_age: float, dry_run: bool) -> None:
+    root = Path(settings.UPLOAD_ROOT)
+    files = iter_files(root)
+    scanned = removed = 0
+    try:
+        while True:
+            batch = list(itertools.islice(files, batch_size))
+            if not batch:
+                break
+            scanned += len(batch)
+            removed += await collect_batch(batch, min_age, dry_run)
+    finally:
+        await dispose_engine()
+    logger.info("Просмотрено файлов: %d, %s: %d", scanned, "сирот" if dry_run else "удалено", removed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Удаление неиспользуемых файлов из каталога загрузок")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--min-age", type=float, default=3600, help="не трогать файлы моложе, сек")
+    parser.add_argument("--dry-run", action="store_true", help="только показать сирот")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    asyncio.run(main(args.batch_size, args.min_age, args.dry_run))
@@ -0,0 +1,166 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Iterable, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile, status
+from starlette.concurrency import run_in_threadpool
+
+from app.settings.settings import settings
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+
+def detect_image_type(head: bytes) -> Optional[str]:
+    """Определяет формат изображения по сигнатуре (magic bytes), возвращает расширение"""
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return ".png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return ".jpg"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return ".gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+
+def content_path(digest: str, extension: str) -> str:
+    """Путь файла по хэшу содержимого с двухуровневым разбиением: ab/cd/abcd....jpg"""
+    return f"{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+
+def _open_temp(target_dir: Path) -> Tuple[BinaryIO, str]:
+    # Временный файл в том же каталоге, чтобы rename был атомарным
+    target_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=target_dir, suffix=".part")
+    return os.fdopen(fd, "wb"), tmp_path
+
+
+def _write_chunk(buffer: BinaryIO, hasher: "hashlib._Hash", chunk: bytes) -> None:
+    hasher.update(chunk)
+    buffer.write(chunk)
+
+
+def _finalize(buffer: BinaryIO, tmp_path: str, target_path: Path) -> None:
+    if target_path.exists():
+        # Такой же файл уже загружен - переиспользуем его. Обновляем mtime,
+        # чтобы сборщик сирот не удалил файл, пока запись в БД не сохранена
+        _discard(buffer, tmp_path)
+        os.utime(target_path)
+        return
+
+    buffer.flush()
+    os.fsync(buffer.fileno())
+    buffer.close()
+    target_path.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(tmp_path, target_path)
+
+
+def _discard(buffer: BinaryIO, tmp_path: str) -> None:
+    if not buffer.closed:
+        buffer.close()
+    try:
+        os.unlink(tmp_path)
+    except FileNotFoundError:
+        pass
+
+
+class UploadService:
+    """Сохранение загруженных файлов в каталог загрузок.
+
+    Файл читается порциями и пишется во временный файл в пуле потоков, поэтому
+    потребление памяти не зависит от размера загрузки, а цикл событий не
+    блокируется записью на диск. Имя файла - SHA-256 содержимого, который
+    считается по ходу записи; одинаковые загрузки сохраняются один раз.
+    """
+
+    def __init__(self, subdir: str = ""):
+        self.root = Path(settings.UPLOAD_ROOT)
+        self.subdir = subdir
+        self.target_dir = self.root / subdir
+
+    @staticmethod
+    def public_url(relative_path: str) -> str:
+        """Полный URL файла по пути относительно каталога загрузок"""
+        return f"{settings.UPLOADS_BASE_URL}/{relative_path}"
+
+    @staticmethod
+    def local_path(photo: str) -> Optional[Path]:
+        """Путь к файлу на диске по значению поля Photo (полный URL или путь uploads/...)"""
+        base_url = f"{settings.UPLOADS_BASE_URL}/"
+        root = f"{settings.UPLOAD_ROOT.rstrip('/')}/"
+        if photo.startswith(base_url):
+            relative_path = photo[len(base_url):]
+        elif photo.startswith(root):
+            relative_path = photo[len(root):]
+        else:
+            return None
+
+        path = Path(settings.UPLOAD_ROOT) / relative_path
+        # Не выпускаем путь за пределы каталога загрузок
+        if ".." in path.parts:
+            return None
+        return path
+
+    async def save_image(self, file: UploadFile, allowed_extensions: Iterable[str] = IMAGE_EXTENSIONS) -> str:
+        """Сохраняет изображение и возвращает путь относительно каталога загрузок"""
+        allowed_extensions = {".jpg" if ext == ".jpeg" else ext for ext in allowed_extensions}
+        max_bytes = settings.UPLOAD_MAX_BYTES
+
+        if not file.filename:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Имя файла отсутствует"
+            )
+
+        file_ext = Path(file.filename).suffix.lower()
+        if (".jpg" if file_ext == ".jpeg" else file_ext) not in allowed_extensions:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Неподдерживаемый формат файла"
+            )
+
+        # Размер из заголовков известен заранее - отказываем до чтения тела
+        if file.size is not None and file.size > max_bytes:
+            raise self._too_large(max_bytes)
+
+        chunk = await file.read(settings.UPLOAD_CHUNK_SIZE)
+        detected_ext = detect_image_type(chunk)
+        if detected_ext not in allowed_extensions:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Содержимое файла не является поддерживаемым изображением"
+            )
+
+        hasher = hashlib.sha256()
+        buffer, tmp_path = await run_in_threadpool(_open_temp, self.target_dir)
+        try:
+            size = 0
+            while chunk:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise self._too_large(max_bytes)
+                await run_in_threadpool(_write_chunk, buffer, hasher, chunk)
+                chunk = await file.read(settings.UPLOAD_CHUNK_SIZE)
+
+            filename = content_path(hasher.hexdigest(), detected_ext)
+            await run_in_threadpool(_finalize, buffer, tmp_path, self.target_dir / filename)
+        except HTTPException:
+            await run_in_threadpool(_discard, buffer, tmp_path)
+            raise
+        except Exception as e:
+            await run_in_threadpool(_discard, buffer, tmp_path)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Ошибка при сохранении файла: {str(e)}"
+            )
+
+        return f"{self.subdir}/{filename}" if self.subdir else filename
+
+    @staticmethod
+    def _too_large(max_bytes: int) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Файл больше допустимых {max_bytes // (1024 * 1024)} МБ"
+        )
@@ -1,10 +1,15 @@
 from typing import Optional, Dict, Any
-from sqlalchemy import select, update
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, UploadFile, status
 from pathlib import Path
-import uuid
+from app.database.errors import UNIQUE_VIOLATION, sqlstate
 from app.models.models import User
+from app.settings.settings import settings
+from app.service.upload_service.upload_service import UploadService, IMAGE_EXTENSIONS
+from app.service.image_service.image_pipeline import image_pipeline
+from app.service.auth_service.password_hasher import password_hasher
 from app.schemas.user.user_schemas import UserAuth, UserRegistration, UserUpdate
 
 class UserService:
@@ -19,32 +24,39 @@ class UserService:
         result = await self.session.execute(select(User).where(User.Login == login))
         return result.scalars().first()
 
-    async def register(self, user_data: UserRegistration) -> User:
-        if await self.get_user_by_login(user_data.Login):
+    @staticmethod
+    def _raise_for_unique(error: IntegrityError) -> None:
+        """Занятый логин определяет уникальный индекс на Login, без отдельной проверки"""
+        if sqlstate(error) == UNIQUE_VIOLATION:
             raise HTTPException(status_code=400, detail="Login already exists")
 
-        user = User(
-            Login=user_data.Login,
-            Password=user_data.Password,
-            Name=user_data.Name,
-            Surname=user_data.Surname,
-            Patronymic=user_data.Patronymic
+    async def register(self, user_data: UserRegistration) -> User:
+        query = (
+            insert(User)
+            .values(
+                Login=user_data.Login,
+                Password=await password_hasher.hash(user_data.Password),
+                Name=user_data.Name,
+                Surname=user_data.Surname,
+                Patronymic=user_data.Patronymic
+            )
+            .returning(User)
         )
-        
-        self.session.add(user)
-        await self.session.commit()
-        await self.session.refresh(user)
+        try:
+            result = await self.session.execute(query)
+            user = result.scalar_one()
+            await self.session.commit()
+        except IntegrityError as e:
+            await self.session.rollback()
+            self._raise_for_unique(e)
+            raise
         return user
 
     async def update_profile(self, user_id: int, data: Dict[str, Any], photo_file: UploadFile = None):
-        existing_user = await self.get_user_by_id(user_id)
-        if not existing_user:
-            raise HTTPException(status_code=404, detail="Пользователь не найден")
-
         if photo_file:
             try:
                 file_name = await self.save_uploaded_file(photo_file)
-                full_photo_url = f"http://212.20.53.169:1211/uploads/{file_name}"
+                full_photo_url = UploadService.public_url(file_name)
                 data['Photo'] = full_photo_url  
             except HTTPException as e:
                 raise e
@@ -55,17 +67,36 @@ class UserService:
                 )
 
         update_fields = {k: v for k, v in data.items() if v is not None}
+        if "Password" in update_fields:
+            update_fields["Password"] = await password_hasher.hash(update_fields["Password"])
+        if "Photo" in update_fields:
+            # Варианты старого фото больше не актуальны, новые построит конвейер
+            update_fields["PhotoVariants"] = None
 
         if not update_fields:
-            return existing_user  
+            existing_user = await self.get_user_by_id(user_id)
+            if not existing_user:
+                raise HTTPException(status_code=404, detail="Пользователь не найден")
+            return existing_user
 
+        # Существование пользователя проверяет сам UPDATE: без строки RETURNING пуст
         query = update(User).where(User.UsersID == user_id).values(**update_fields).returning(User)
         
         try:
             result = await self.session.execute(query)
-            await self.session.commit()
             updated_user = result.scalars().first()
-            return updated_user
+            await self.session.commit()
+        except IntegrityError as e:
+            await self.session.rollback()
+            self._raise_for_unique(e)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Ошибка при обновлении профиля: {str(e)}"
+            )
+        except HTTPException as e:
+            # 503 при перегрузке или отмене запроса по statement_timeout
+            await self.session.rollback()
+            raise e
         except Exception as e:
             await self.session.rollback()
             raise HTTPException(
@@ -73,60 +104,41 @@ class UserService:
                 detail=f"Ошибка при обновлении профиля: {str(e)}"
             )
 
+        if updated_user is None:
+            raise HTTPException(status_code=404, detail="Пользователь не найден")
+        if "Photo" in update_fields:
+            image_pipeline.schedule(User, update_fields["Photo"])
+        return updated_user
+
     async def authenticate(self, auth_data: UserAuth) -> User:
         user = await self.get_user_by_login(auth_data.Login)
-        if not user or auth_data.Password != user.Password:
+        if not user or not await password_hasher.verify(auth_data.Password, user.Password):
             raise HTTPException(status_code=401, detail="Invalid credentials")
+
+        if not password_hasher.is_hashed(user.Password):
+            # Старая запись с паролем в открытом виде - хэшируем при первом входе
+            user.Password = await password_hasher.hash(auth_data.Password)
+            await self.session.commit()
         return user
 
     async def upload_photo(self, user_id: int, photo: UploadFile) -> str:
-        user = await self.get_user_by_id(user_id)
-        if not user:
+        file_name = await UploadService().save_image(photo, IMAGE_EXTENSIONS)
+        filepath = str(Path(settings.UPLOAD_ROOT) / file_name)
+
+        result = await self.session.execute(
+            update(User)
+            .where(User.UsersID == user_id)
+            .values(Photo=filepath, PhotoVariants=None)
+            .returning(User.UsersID)
+        )
+        if result.scalar_one_or_none() is None:
+            await self.session.rollback()
             raise HTTPException(status_code=404, detail="User not found")
-
-        file_ext = Path(photo.filename).suffix.lower()
-        if file_ext not in ['.png', '.jpg', '.jpeg']:
-            raise HTTPException(status_code=400, detail="Invalid file type")
-
-        filename = f"{uuid.uuid4()}{file_ext}"
-        filepath = Path(f"uploads/{filename}")
-        filepath.parent.mkdir(exist_ok=True)
-
-        with open(filepath, "wb") as buffer:
-            buffer.write(await photo.read())
-
-        user.Photo = str(filepath)
         await self.session.commit()
-        return str(filepath)
+        image_pipeline.schedule(User, filepath)
+        return filepath
     
     @staticmethod
-    async def save_uploaded_file(file: UploadFile, upload_dir: str = "uploads") -> str:
-        upload_path = Path(upload_dir)
-        upload_path.mkdir(parents=True, exist_ok=True)
-        
-        if not file.filename:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Имя файла отсутствует"
-            )
-        
-        file_ext = Path(file.filename).suffix.lower()
-        if file_ext not in ['.png', '.jpg', '.jpeg', '.gif']:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Неподдерживаемый формат файла"
-            )
-        
-        file_name = f"{uuid.uuid4()}{file_ext}"
-        file_path = upload_path / file_name
-        
-        try:
-            with open(file_path, "wb") as buffer:
-                content = await file.read()
-                buffer.write(content)
-            return file_name
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Ошибка при сохранении файла: {str(e)}"
-            )
\ No newline at end of file
+    async def save_uploaded_file(file: UploadFile, subdir: str = "") -> str:
+        """Сохраняет фото пользователя, возвращает путь относительно каталога загрузок"""
+        return await UploadService(subdir).save_image(file, IMAGE_EXTENSIONS + (".gif",))
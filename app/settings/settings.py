@@ -1,3 +1,6 @@
+from typing import List
+
+from pydantic import field_validator
 from pydantic_settings import BaseSettings
 from yarl import URL
 class Settings(BaseSettings):
@@ -7,10 +10,111 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str
     POSTGRES_DB: str
     API_BASE_PORT: int
+
+    # Пул соединений с БД (один на процесс)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_POOL_WARMUP: int = 5
+
+    # Допуск к БД: не больше DB_ADMISSION_LIMIT сессий одновременно (0 - DB_POOL_SIZE + DB_MAX_OVERFLOW),
+    # остальные ждут в очереди по приоритету маршрута
+    DB_ADMISSION_LIMIT: int = 0
+    DB_ADMISSION_QUEUE_SIZE: int = 200
+    DB_ADMISSION_QUEUE_TIMEOUT: float = 3.0
+    DB_ADMISSION_RETRY_AFTER: int = 1
+
+    # statement_timeout в мс (0 - без ограничения): общий и для отдельных классов маршрутов
+    DB_STATEMENT_TIMEOUT_MS: int = 0
+    DB_CATALOG_STATEMENT_TIMEOUT_MS: int = 2000
+    DB_WRITE_STATEMENT_TIMEOUT_MS: int = 5000
+    DB_BULK_STATEMENT_TIMEOUT_MS: int = 60000  # импорт, выгрузка и фоновые задачи
+
+    # Реплики для чтения: URL через запятую; пусто - все запросы идут в основную БД
+    DB_REPLICA_URLS: str = ""
+    DB_REPLICA_HEALTH_INTERVAL: float = 5.0
+    DB_REPLICA_HEALTH_TIMEOUT: float = 2.0
+    DB_REPLICA_MAX_LAG: float = 5.0  # секунд отставания, после которых реплика выводится из ротации
+    DB_READ_YOUR_WRITES_WINDOW: float = 5.0  # секунд чтения из основной БД после записи пользователя
+
+    # Кэш каталога товаров в памяти процесса
+    PRODUCT_CACHE_MAX_ENTRIES: int = 2048
+    PRODUCT_CACHE_TTL: float = 300.0
+    PRODUCT_LOADER_MAX_BATCH: int = 500
+
+    # Массовый импорт каталога
+    PRODUCT_IMPORT_BATCH_SIZE: int = 5000
+    PRODUCT_IMPORT_MAX_BYTES: int = 200 * 1024 * 1024
+    PRODUCT_IMPORT_MAX_LINE_CHARS: int = 64 * 1024  # более длинная строка отклоняется целиком
+    PRODUCT_EXPORT_CHUNK_ROWS: int = 1000
+    PRODUCT_EXPORT_GZIP_LEVEL: int = 6
+
+    # Загрузка файлов
+    UPLOAD_ROOT: str = "uploads"
+    UPLOADS_BASE_URL: str = "http://212.20.53.169:1211/uploads"
+    UPLOAD_MAX_BYTES: int = 10 * 1024 * 1024
+    UPLOAD_CHUNK_SIZE: int = 64 * 1024
+
+    # Раздача /uploads
+    UPLOADS_CACHE_MAX_AGE: int = 86400
+    UPLOADS_STAT_CACHE_SIZE: int = 4096
+    UPLOADS_STAT_CACHE_TTL: float = 10.0
+
+    # Фоновая генерация миниатюр и WebP
+    IMAGE_PIPELINE_WORKERS: int = 2
+    IMAGE_PIPELINE_WEBP_QUALITY: int = 80
+
+    # Хэширование паролей
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+
+    # Инвалидация кэшей между процессами через LISTEN/NOTIFY
+    CACHE_INVALIDATION_ENABLED: bool = True
+    CACHE_INVALIDATION_CHANNEL: str = "cache_invalidation"
+    CACHE_INVALIDATION_MAX_IDS: int = 500  # больше ID в одном событии - сброс кэша целиком
+    CACHE_INVALIDATION_KEEPALIVE: float = 30.0
+
+    # Метрики Prometheus и наблюдение за SQL-запросами
+    METRICS_ENABLED: bool = True
+    METRICS_SLOW_QUERY_SECONDS: float = 0.2
+    METRICS_SLOW_QUERY_SAMPLES: int = 100
+    METRICS_N_PLUS_ONE_THRESHOLD: int = 10
+    METRICS_POOL_REFRESH_SECONDS: float = 5.0  # под gunicorn: как часто воркер обновляет метрики пула
+
+    # Профилирование отдельных запросов (pyinstrument); по умолчанию выключено
+    PROFILING_ENABLED: bool = False
+    PROFILING_HEADER: str = "X-Profile"
+    PROFILING_TOKEN: str = ""  # значение заголовка; пустое - заголовок не включает профилирование
+    PROFILING_SAMPLE_RATE: float = 0.0  # доля случайных запросов
+    PROFILING_INTERVAL: float = 0.001
+    PROFILING_FORMAT: str = "speedscope"  # speedscope или pstats
+    PROFILING_DIR: str = "profiles"
+    PROFILING_MAX_FILES: int = 200
+
+    # JWT: ключ подписи задается только окружением развертывания, не файлом в репозитории
+    JWT_SECRET_KEY: str
+    JWT_ALGORITHM: str = "HS256"
+    ACCESS_TOKEN_TTL: int = 15 * 60
+    REFRESH_TOKEN_TTL: int = 30 * 24 * 60 * 60
+    TOKEN_CACHE_SIZE: int = 10000
     
     class Config:
         env_file = ".env"
 
+    @field_validator("JWT_SECRET_KEY")
+    @classmethod
+    def _check_jwt_secret(cls, value: str) -> str:
+        # Известным или коротким ключом HS256 любой может подписать токен за любого пользователя
+        if value.lower().startswith("change-me"):
+            raise ValueError("JWT_SECRET_KEY не задан: замените значение-заглушку")
+        if len(value.encode()) < 32:
+            raise ValueError("JWT_SECRET_KEY должен быть не короче 32 байт")
+        return value
+
     @property
     def db_url(self) -> URL:
         url = URL.build (
@@ -22,5 +126,9 @@ class Settings(BaseSettings):
             path=f"/{self.POSTGRES_DB}"
         )
         return url
+
+    @property
+    def db_replica_urls(self) -> List[str]:
+        return [url.strip() for url in self.DB_REPLICA_URLS.split(",") if url.strip()]
     
 settings: Settings = Settings()
\ No newline at end of file
@@ -0,0 +1,243 @@
+import mimetypes
+import os
+import re
+import stat
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.types import Receive, Scope, Send
+
+from app.settings.settings import settings
+
+mimetypes.add_type("image/webp", ".webp")
+
+# Имя по SHA-256 содержимого (и его варианты): такой файл никогда не меняется
+CONTENT_ADDRESSED_NAME = re.compile(r"^[0-9a-f]{64}(\.[a-z0-9]+)*$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+CHUNK_SIZE = 64 * 1024
+
+
+class _FileInfo:
+    __slots__ = ("path", "size", "mtime", "etag", "last_modified", "content_type", "cache_control")
+
+    def __init__(self, path: str, stat_result: os.stat_result):
+        name = os.path.basename(path)
+        self.path = path
+        self.size = stat_result.st_size
+        self.mtime = stat_result.st_mtime
+        if CONTENT_ADDRESSED_NAME.match(name):
+            self.etag = f'"{name}"'
+            self.cache_control = IMMUTABLE_CACHE_CONTROL
+        else:
+            self.etag = f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+            self.cache_control = f"public, max-age={settings.UPLOADS_CACHE_MAX_AGE}"
+        self.last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+        self.content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+
+class UploadsStaticFiles:
+    """Раздача файлов из каталога загрузок.
+
+    В отличие от StaticFiles отдает сильный ETag и immutable-кэширование для
+    файлов с именем по хэшу содержимого, поддерживает Range-запросы, использует
+    sendfile, если сервер его поддерживает (расширение http.response.zerocopysend),
+    и кэширует результаты stat для часто запрашиваемых файлов.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = os.path.realpath(directory)
+        self._stat_cache: "OrderedDict[str, Tuple[float, Optional[_FileInfo]]]" = OrderedDict()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        assert scope["type"] == "http"
+
+        method = scope["method"]
+        if method not in ("GET", "HEAD"):
+            await self._send_empty(send, 405, [(b"allow", b"GET, HEAD")])
+            return
+
+        relative_path = self._relative_path(self._route_path(scope))
+        info = await self._lookup(relative_path) if relative_path is not None else None
+        if info is None:
+            await self._send_empty(send, 404)
+            return
+
+        headers = dict(scope["headers"])
+        base_headers = [
+            (b"etag", info.etag.encode()),
+            (b"last-modified", info.last_modified.encode()),
+            (b"cache-control", info.cache_control.encode()),
+            (b"accept-ranges", b"bytes"),
+        ]
+
+        if self._not_modified(headers, info):
+            await self._send_empty(send, 304, base_headers)
+            return
+
+        start, end = 0, info.size - 1
+        status_code = 200
+        range_header = headers.get(b"range")
+        if range_header is not None and self._if_range_matches(headers, info):
+            byte_range = self._parse_range(range_header.decode("latin-1"), info.size)
+            if byte_range is False:
+                await self._send_empty(
+                    send, 416, base_headers + [(b"content-range", f"bytes */{info.size}".encode())]
+                )
+                return
+            if byte_range is not None:
+                start, end = byte_range
+                status_code = 206
+                base_headers.append((b"content-range", f"bytes {start}-{end}/{info.size}".encode()))
+
+        length = end - start + 1 if info.size else 0
+        response_headers = base_headers + [
+            (b"content-type", info.content_type.encode()),
+            (b"content-length", str(length).encode()),
+        ]
+
+        if method == "HEAD" or length == 0:
+            await send({"type": "http.response.start", "status": status_code, "headers": response_headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        try:
+            file = await run_in_threadpool(open, info.path, "rb")
+        except FileNotFoundError:
+            # Файл удалили после stat - сбрасываем кэш
+            self._stat_cache.pop(relative_path, None)
+            await self._send_empty(send, 404)
+            return
+
+        try:
+            await send({"type": "http.response.start", "status": status_code, "headers": response_headers})
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": file.fileno(),
+                    "offset": start,
+                    "count": length,
+                })
+                return
+
+            await run_in_threadpool(file.seek, start)
+            remaining = length
+            while remaining > 0:
+                chunk = await run_in_threadpool(file.read, min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        finally:
+            await run_in_threadpool(file.close)
+
+    def _route_path(self, scope: Scope) -> str:
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        return path
+
+    @staticmethod
+    def _relative_path(route_path: str) -> Optional[str]:
+        relative_path = os.path.normpath(route_path.lstrip("/"))
+        if relative_path.startswith("..") or os.path.isabs(relative_path) or relative_path == ".":
+            return None
+        return relative_path
+
+    async def _lookup(self, relative_path: str) -> Optional[_FileInfo]:
+        """Находит файл по пути запроса, результат кэшируется на короткое время.
+
+        Ключ кэша - путь запроса, поэтому при попадании не нужен ни stat, ни
+        realpath; разрешенный путь хранится в _FileInfo.
+        """
+        now = time.monotonic()
+        cached = self._stat_cache.get(relative_path)
+        if cached is not None and cached[0] > now:
+            self._stat_cache.move_to_end(relative_path)
+            return cached[1]
+
+        info = await run_in_threadpool(self._resolve, relative_path)
+
+        self._stat_cache[relative_path] = (now + settings.UPLOADS_STAT_CACHE_TTL, info)
+        self._stat_cache.move_to_end(relative_path)
+        while len(self._stat_cache) > settings.UPLOADS_STAT_CACHE_SIZE:
+            self._stat_cache.popitem(last=False)
+        return info
+
+    def _resolve(self, relative_path: str) -> Optional[_FileInfo]:
+        # Символические ссылки разрешаются: файл должен оставаться внутри каталога загрузок
+        full_path = os.path.realpath(os.path.join(self.directory, relative_path))
+        if os.path.commonpath([full_path, self.directory]) != self.directory:
+            return None
+        try:
+            stat_result = os.stat(full_path)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        return _FileInfo(full_path, stat_result) if stat.S_ISREG(stat_result.st_mode) else None
+
+    @staticmethod
+    def _etags(value: bytes) -> List[str]:
+        return [tag.strip().removeprefix("W/") for tag in value.decode("latin-1").split(",")]
+
+    def _not_modified(self, headers: dict, info: _FileInfo) -> bool:
+        if_none_match = headers.get(b"if-none-match")
+        if if_none_match is not None:
+            tags = self._etags(if_none_match)
+            return "*" in tags or info.etag in tags
+
+        if_modified_since = headers.get(b"if-modified-since")
+        if if_modified_since is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since.decode("latin-1")).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(info.mtime) <= since
+        return False
+
+    @staticmethod
+    def _if_range_matches(headers: dict, info: _FileInfo) -> bool:
+        if_range = headers.get(b"if-range")
+        if if_range is None:
+            return True
+        value = if_range.decode("latin-1").strip()
+        return value == info.etag or value == info.last_modified
+
+    @staticmethod
+    def _parse_range(value: str, size: int):
+        """Разбирает одиночный диапазон bytes=...
+
+        Возвращает (start, end), None - если заголовок нужно проигнорировать
+        (несколько диапазонов или неверный синтаксис), False - если диапазон
+        невыполним.
+        """
+        unit, _, ranges = value.partition("=")
+        if unit.strip() != "bytes" or "," in ranges:
+            return None
+        first, sep, last = ranges.strip().partition("-")
+        if not sep:
+            return None
+        try:
+            if first:
+                start = int(first)
+                end = int(last) if last else size - 1
+            elif last:
+                start = max(size - int(last), 0)
+                end = size - 1
+            else:
+                return None
+        except ValueError:
+            return None
+
+        if start >= size:
+            return False
+        if start > end:
+            return None
+        return start, min(end, size - 1)
+
+    @staticmethod
+    async def _send_empty(send: Send, status_code: int, headers: Optional[list] = None) -> None:
+        await send({"type": "http.response.start", "status": status_code, "headers": headers or []})
+        await send({"type": "http.response.body", "body": b""})
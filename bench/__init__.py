@@ -0,0 +1 @@
+"""Нагрузочные замеры эндпоинтов /v1 (см. bench/run.py)."""
@@ -0,0 +1,74 @@
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class EphemeralPostgres:
+    """Временный кластер PostgreSQL в каталоге /tmp на свободном порту.
+
+    Нужны initdb и pg_ctl той же версии, что и в проде: из PATH или из ``bin_dir``
+    (переменная PG_BIN). initdb не запускается от root.
+    """
+
+    def __init__(self, bin_dir: Optional[str] = None, database: str = "bench"):
+        self.bin_dir = bin_dir or os.environ.get("PG_BIN")
+        self.database = database
+        self.port = _free_port()
+        self.data_dir: Optional[Path] = None
+
+    def _bin(self, name: str) -> str:
+        path = str(Path(self.bin_dir) / name) if self.bin_dir else shutil.which(name)
+        if not path or not Path(path).exists():
+            raise RuntimeError(f"{name} не найден: добавьте каталог PostgreSQL в PATH или укажите --pg-bin")
+        return path
+
+    def _run(self, *args: str) -> None:
+        result = subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"{Path(args[0]).name}: {result.stderr.strip()}")
+
+    def start(self) -> Dict[str, str]:
+        """Создает и запускает кластер, возвращает переменные окружения для Settings"""
+        self.data_dir = Path(tempfile.mkdtemp(prefix="bench-pg-"))
+        self._run(self._bin("initdb"), "-D", str(self.data_dir), "-U", "postgres", "--auth=trust", "-E", "UTF8")
+        self._run(
+            self._bin("pg_ctl"), "-D", str(self.data_dir), "-w", "-l", str(self.data_dir / "server.log"),
+            "-o", f"-h 127.0.0.1 -p {self.port} -k {self.data_dir}", "start"
+        )
+        self._run(self._bin("createdb"), "-h", "127.0.0.1", "-p", str(self.port), "-U", "postgres", self.database)
+        return {
+            "POSTGRES_HOST": "127.0.0.1",
+            "POSTGRES_PORT": str(self.port),
+            "POSTGRES_USER": "postgres",
+            "POSTGRES_PASSWORD": "",
+            "POSTGRES_DB": self.database,
+        }
+
+    def stop(self) -> None:
+        if self.data_dir is None:
+            return
+        try:
+            self._run(self._bin("pg_ctl"), "-D", str(self.data_dir), "-m", "fast", "-w", "stop")
+        finally:
+            shutil.rmtree(self.data_dir, ignore_errors=True)
+            self.data_dir = None
+
+    def __enter__(self) -> Dict[str, str]:
+        try:
+            return self.start()
+        except BaseException:
+            self.stop()
+            raise
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
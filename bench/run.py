@@ -0,0 +1,276 @@
+"""Замеры эндпоинтов /v1 на отдельной базе PostgreSQL.
+
+Приложение запускается в этом же процессе через httpx.ASGITransport (с lifespan),
+база заполняется данными объема Volumes, затем каждый сценарий из SCENARIOS
+выполняется с заданной конкурентностью; после пишущего сценария база заполняется
+заново. Для каждого сценария считаются пропускная способность, p50/p95/p99 и
+число SQL-запросов на HTTP-запрос.
+
+Запуск:
+    python -m bench.run                                   # временный кластер: initdb/pg_ctl из PATH или --pg-bin
+    python -m bench.run --db-url postgresql://u:p@host:5432/bench --reset-db
+    python -m bench.run --save-baseline                   # записать bench/baseline.json
+    python -m bench.run --compare bench/baseline.json     # код выхода 1 при регрессии
+
+Нужна именно PostgreSQL: схема и запросы используют tsvector, pg_trgm,
+ON CONFLICT, ANY(array) и COPY, поэтому режима с SQLite нет. База из --db-url
+полностью очищается перед заполнением.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import secrets
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+from yarl import URL
+
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_OUTPUT = ROOT / "bench" / "results" / "latest.json"
+DEFAULT_BASELINE = ROOT / "bench" / "baseline.json"
+
+
+class QueryCounter:
+    """Считает SQL-запросы, выполненные движком"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.value = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args) -> None:
+        self.value += 1
+
+
+def _env_from_url(db_url: str) -> Dict[str, str]:
+    url = URL(db_url)
+    return {
+        "POSTGRES_HOST": url.host or "127.0.0.1",
+        "POSTGRES_PORT": str(url.port or 5432),
+        "POSTGRES_USER": url.user or "postgres",
+        "POSTGRES_PASSWORD": url.password or "",
+        "POSTGRES_DB": url.path.lstrip("/"),
+    }
+
+
+def _migrate() -> None:
+    # Alembic выполняет асинхронный драйвер через свой цикл событий, поэтому до asyncio.run
+    from alembic import command
+    from alembic.config import Config
+
+    command.upgrade(Config(str(ROOT / "alembic.ini")), "head")
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _percentile(quantiles: List[float], p: int) -> float:
+    return round(quantiles[p - 1] * 1000, 2)
+
+
+async def run_scenario(client, scenario, ctx, counter: QueryCounter, args, rng: random.Random) -> Dict[str, Any]:
+    async def send() -> tuple:
+        method, url, kwargs = scenario.build(ctx, rng)
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        return time.perf_counter() - started, response.status_code
+
+    requests, warmup = args.requests, args.warmup
+    if scenario.max_requests is not None:
+        requests, warmup = min(requests, scenario.max_requests), min(warmup, scenario.max_requests)
+
+    for _ in range(warmup):
+        await send()
+
+    latencies: List[float] = []
+    errors = 0
+    pending = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for _ in pending:
+            elapsed, status_code = await send()
+            latencies.append(elapsed)
+            if status_code >= 400:
+                errors += 1
+
+    queries = counter.value
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    queries = counter.value - queries
+
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": _percentile(quantiles, 50),
+        "p95_ms": _percentile(quantiles, 95),
+        "p99_ms": _percentile(quantiles, 99),
+        "queries_per_request": round(queries / len(latencies), 2),
+    }
+
+
+async def run(args) -> Dict[str, Any]:
+    # Модули приложения читают Settings при импорте - только после настройки окружения
+    import httpx
+    from sqlalchemy import text
+
+    from app.database.database import get_engine
+    from app.service.auth_service.token_service import token_service
+    from app.service.product_service.product_cache import product_cache
+    from bench.scenarios import SCENARIOS, BenchContext
+    from bench.seed import Volumes, seed
+    from main import app
+
+    volumes = Volumes(users=args.users, products=args.products, basket_items=args.basket_items)
+    scenarios = [s for s in SCENARIOS if not args.scenarios or s.name in args.scenarios]
+
+    async with app.router.lifespan_context(app):
+        engine = get_engine()
+        async with engine.connect() as conn:
+            server_version = (await conn.execute(text("SHOW server_version"))).scalar_one()
+
+        print(f"Заполнение: {volumes}", file=sys.stderr)
+        # Повторное заполнение с тем же зерном дает те же строки и ID, токены остаются верными
+        info = await seed(engine, volumes, random.Random(args.seed))
+        issued = {user_id: token_service.issue(user_id, login) for user_id, login in enumerate(info.logins, start=1)}
+        ctx = BenchContext(
+            seed=info,
+            tokens={user_id: pair.access_token for user_id, pair in issued.items()},
+            refresh_tokens={user_id: pair.refresh_token for user_id, pair in issued.items()},
+        )
+        counter = QueryCounter(engine)
+
+        results: Dict[str, Any] = {}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            print(f"{'scenario':<20}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'q/req':>8}{'errors':>8}")
+            dirty = False
+            for scenario in scenarios:
+                # Пишущий сценарий не должен влиять на следующие: база возвращается к исходным данным
+                if dirty:
+                    await seed(engine, volumes, random.Random(args.seed))
+                    dirty = False
+                # Каждый сценарий начинается с холодного кэша товаров, прогрев - часть warmup
+                product_cache.clear()
+                ctx.reset(random.Random(args.seed))
+                result = await run_scenario(client, scenario, ctx, counter, args, random.Random(args.seed))
+                dirty = scenario.writes
+                results[scenario.name] = result
+                print(
+                    f"{scenario.name:<20}{result['rps']:>9}{result['p50_ms']:>9}{result['p95_ms']:>9}"
+                    f"{result['p99_ms']:>9}{result['queries_per_request']:>8}{result['errors']:>8}"
+                )
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "postgres": server_version,
+            "database": "url" if args.db_url else "ephemeral",
+            "volumes": vars(volumes),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+        },
+        "results": results,
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Печатает сравнение с базовой линией и возвращает список регрессий"""
+    regressions = []
+    print(f"\nСравнение с базовой линией {baseline['meta'].get('commit')} (допуск p95 {tolerance:.0%}):")
+    for name, current in report["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        change = current["p95_ms"] / base["p95_ms"] - 1 if base["p95_ms"] else 0.0
+        print(
+            f"{name:<20} p95 {base['p95_ms']:>8} -> {current['p95_ms']:<8} ({change:+.0%})  "
+            f"rps {base['rps']} -> {current['rps']}  "
+            f"q/req {base['queries_per_request']} -> {current['queries_per_request']}"
+        )
+        if change > tolerance:
+            regressions.append(f"{name}: p95 вырос на {change:.0%}")
+        # Попадания в кэш при конкурентных запросах немного плавают, отсюда запас
+        if current["queries_per_request"] > base["queries_per_request"] * 1.1 + 0.05:
+            regressions.append(f"{name}: больше запросов к БД на HTTP-запрос")
+        if current["errors"] > base["errors"]:
+            regressions.append(f"{name}: больше ошибок ({base['errors']} -> {current['errors']})")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Замеры эндпоинтов /v1")
+    parser.add_argument("--db-url", help="готовая пустая база вместо временного кластера")
+    parser.add_argument("--reset-db", action="store_true", help="подтверждение очистки базы из --db-url")
+    parser.add_argument("--pg-bin", help="каталог с initdb и pg_ctl (по умолчанию PATH или PG_BIN)")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--basket-items", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=500, help="запросов на сценарий")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scenarios", nargs="*", help="только указанные сценарии")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument("--save-baseline", action="store_true", help=f"записать результат в {DEFAULT_BASELINE.name}")
+    parser.add_argument("--compare", type=Path, help="файл базовой линии для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="допустимый рост p95")
+    args = parser.parse_args()
+
+    if args.db_url and not args.reset_db:
+        parser.error("база из --db-url будет очищена; подтвердите флагом --reset-db")
+
+    os.chdir(ROOT)
+    with ExitStack() as stack:
+        if args.db_url:
+            env = _env_from_url(args.db_url)
+        else:
+            from bench.postgres import EphemeralPostgres
+
+            env = stack.enter_context(EphemeralPostgres(args.pg_bin))
+        os.environ.update(env)
+        os.environ.setdefault("JWT_SECRET_KEY", secrets.token_hex(32))
+        os.environ.setdefault("API_BASE_PORT", "0")
+
+        _migrate()
+        report = asyncio.run(run(args))
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"\nРезультат: {args.output}")
+    if args.save_baseline:
+        DEFAULT_BASELINE.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+        print(f"Базовая линия: {DEFAULT_BASELINE}")
+
+    if args.compare:
+        regressions = compare(report, json.loads(args.compare.read_text()), args.tolerance)
+        if regressions:
+            print("\nРегрессии:\n  " + "\n  ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+import json
+import random
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from bench.seed import BENCH_PASSWORD, SeedInfo
+
+# Метод, путь и аргументы httpx.AsyncClient.request
+RequestSpec = Tuple[str, str, Dict[str, Any]]
+
+
+@dataclass
+class BenchContext:
+    seed: SeedInfo
+    tokens: Dict[int, str] = field(default_factory=dict)
+    refresh_tokens: Dict[int, str] = field(default_factory=dict)
+    baskets: Dict[int, List[int]] = field(init=False)
+    _unused_basket: List[Tuple[int, int]] = field(init=False, default_factory=list)
+
+    def __post_init__(self) -> None:
+        self.baskets = {}
+        for user_id, product_id in self.seed.basket:
+            self.baskets.setdefault(user_id, []).append(product_id)
+
+    def reset(self, rng: random.Random) -> None:
+        """Вызывается перед каждым сценарием, когда корзины совпадают с seed"""
+        self._unused_basket = rng.sample(self.seed.basket, len(self.seed.basket))
+
+    def basket_item(self, rng: random.Random) -> Tuple[int, int]:
+        """Позиция корзины, еще не выданная в этом сценарии: удаление не попадет в уже удаленную"""
+        if self._unused_basket:
+            return self._unused_basket.pop()
+        return rng.choice(self.seed.basket)
+
+    def user(self, rng: random.Random) -> int:
+        return rng.randint(1, self.seed.users)
+
+    def product(self, rng: random.Random) -> int:
+        return rng.randint(1, self.seed.products)
+
+    def auth(self, user_id: int) -> Dict[str, Any]:
+        return {"headers": {"Authorization": f"Bearer {self.tokens[user_id]}"}}
+
+
+@dataclass
+class Scenario:
+    name: str
+    build: Callable[[BenchContext, random.Random], RequestSpec]
+    # Пишущий сценарий меняет данные: после него база заполняется заново
+    writes: bool = False
+    # Ограничение числа запросов (и прогрева) для тяжелых сценариев вроде выгрузки каталога
+    max_requests: Optional[int] = None
+
+
+def _products_page(ctx: BenchContext, rng: random.Random) -> RequestSpec:
+    return "GET", "/v1/", {"params": {"limit": 20, "sort": rng.choice(["id", "-id", "price", "-price"])}}
+
+
+def _products_filtered(ctx: BenchContext, rng: random.Random) -> RequestSpec:
+    low = rng.randint(20, 250)
+    return "GET", "/v1/", {"params": {"limit": 20, "min_price": low, "max_price": low + 50, "sort": "price"}}
+
+
+def _product_get(ctx: BenchContext, rng: random.Random) -> RequestSpec:
+    return "GET", f"/v1/{ctx.product(rng)}", {}
+
+
+def _product_batch(ctx: BenchContext, rng: random.Random) -> RequestSpec:
+    return "GET", "/v1/batch", {"params": [("ids", ctx.product(rng)) for _ in range(20)]}
+
+
+def _product_search(ctx: BenchContext, rng: random.Random) -> RequestSpec:
+    return "GET", "/v1/search", {"params": {"q": rng.choice(ctx.seed.words), "limit": 20}}
+
+
+def _product_suggest(ctx: BenchContext, rng: random.Random) -> RequestSpec:
+    word = rng.choice(ctx.seed.words)
+    return "GET", "/v1/search/suggest", {"params": {"q": word[:max(3, len(word) - 1)]}}
+
+
+def _product_create(ctx: BenchContext, rng: random.Random) -> RequestSpec:
+    return "POST", "/v1/", {"data": {"name": f"Bench {rng.random():.6f}", "price": "99.9"}}
+
+
+def _product_export(ctx: BenchContext, rng: random.Random) -> RequestSpec:
+    return "GET", "/v1/export", {"params": {"format": "ndjson"}}
+
+
+def _product_import(ctx: BenchContext, rng: random.Random) -> RequestSpec:
+    # Половина строк обновляет существующие товары, половина создает новые
+    rows = [
+        {"ProductID": ctx.product(rng), "Name": f"Bench {rng.random():.6f}", "Price": round(rng.uniform(20, 300), 2)}
+        for _ in range(50)
+    ] + [
+        {"Name": f"Bench {rng.random():.6f}", "Price": round(rng.uniform(20, 300), 2)}
+        for _ in range(50)
+    ]
+    spec = ctx.auth(ctx.user(rng))
+    spec["headers"]["Content-Type"] = "application/x-ndjson"
+    spec["content"] = "".join(json.dumps(row) + "\n" for row in rows)
+    return "POST", "/v1/import", spec
+
+
+def _register(ctx: BenchContext, rng: random.Random) -> RequestSpec:
+    login = f"bench-new-{rng.getrandbits(64):016x}"
+    return "POST", "/v1/register", {"json": {"Login": login, "Password": BENCH_PASSWORD, "Name": "Иван", "Surname": "Петров"}}
+
+
+def _user_get(ctx: BenchContext, rng: random.Random) -> RequestSpec:
+    user_id = ctx.user(rng)
+    return "GET", f"/v1/users/{user_id}", ctx.auth(user_id)
+
+
+def _user_update(ctx: BenchContext, rng: random.Random) -> RequestSpec:
+    user_id = ctx.user(rng)
+    spec = ctx.auth(user_id)
+    spec["params"] = {"Name": rng.choice(["Иван", "Петр", "Анна", "Мария"])}
+    return "PUT", f"/v1/users/{user_id}", spec
+
+
+def _token_refresh(ctx: BenchContext, rng: random.Random) -> RequestSpec:
+    return "POST", "/v1/token/refresh", {"json": {"refresh_token": ctx.refresh_tokens[ctx.user(rng)]}}
+
+
+def _login(ctx: BenchContext, rng: random.Random) -> RequestSpec:
+    login = ctx.seed.logins[ctx.user(rng) - 1]
+    return "POST", "/v1/token", {"json": {"Login": login, "Password": BENCH_PASSWORD}}
+
+
+def _basket_get(ctx: BenchContext, rng: random.Random) -> RequestSpec:
+    return "GET", "/v1/basket/get_all_basket", ctx.auth(ctx.user(rng))
+
+
+def _basket_summary(ctx: BenchContext, rng: random.Random) -> RequestSpec:
+    return "GET", "/v1/basket/summary", ctx.auth(ctx.user(rng))
+
+
+def _basket_increment(ctx: BenchContext, rng: random.Random) -> RequestSpec:
+    spec = ctx.auth(ctx.user(rng))
+    spec["params"] = {"product_id": ctx.product(rng)}
+    return "POST", "/v1/basket/increment", spec
+
+
+def _basket_add(ctx: BenchContext, rng: random.Random) -> RequestSpec:
+    spec = ctx.auth(ctx.user(rng))
+    spec["params"] = {"product_id": ctx.product(rng)}
+    return "POST", "/v1/basket/add_to_basket", spec
+
+
+def _basket_decrement(ctx: BenchContext, rng: random.Random) -> RequestSpec:
+    user_id, product_id = ctx.basket_item(rng)
+    spec = ctx.auth(user_id)
+    spec["params"] = {"product_id": product_id}
+    return "POST", "/v1/basket/decrement", spec
+
+
+def _basket_delete(ctx: BenchContext, rng: random.Random) -> RequestSpec:
+    user_id, product_id = ctx.basket_item(rng)
+    spec = ctx.auth(user_id)
+    spec["params"] = {"product_id": product_id}
+    return "DELETE", "/v1/basket/delete_from_basket", spec
+
+
+def _basket_bulk_add(ctx: BenchContext, rng: random.Random) -> RequestSpec:
+    spec = ctx.auth(ctx.user(rng))
+    spec["json"] = {"ProductIDs": [ctx.product(rng) for _ in range(10)]}
+    return "POST", "/v1/basket/bulk_add_to_basket", spec
+
+
+def _basket_bulk_delete(ctx: BenchContext, rng: random.Random) -> RequestSpec:
+    user_id = ctx.user(rng)
+    spec = ctx.auth(user_id)
+    spec["json"] = {"ProductIDs": ctx.baskets.get(user_id, [])[:5] + [ctx.product(rng) for _ in range(5)]}
+    return "POST", "/v1/basket/bulk_delete_from_basket", spec
+
+
+def _basket_replace(ctx: BenchContext, rng: random.Random) -> RequestSpec:
+    spec = ctx.auth(ctx.user(rng))
+    spec["json"] = {"ProductIDs": [ctx.product(rng) for _ in range(10)]}
+    return "PUT", "/v1/basket/replace_basket", spec
+
+
+def _basket_clear(ctx: BenchContext, rng: random.Random) -> RequestSpec:
+    return "DELETE", "/v1/basket/clear_basket", ctx.auth(ctx.user(rng))
+
+
+SCENARIOS: List[Scenario] = [
+    Scenario("products_page", _products_page),
+    Scenario("products_filtered", _products_filtered),
+    Scenario("product_get", _product_get),
+    Scenario("product_batch", _product_batch),
+    Scenario("product_search", _product_search),
+    Scenario("product_suggest", _product_suggest),
+    Scenario("user_get", _user_get),
+    Scenario("basket_get", _basket_get),
+    Scenario("basket_summary", _basket_summary),
+    Scenario("product_export", _product_export, max_requests=20),
+    Scenario("login", _login),
+    Scenario("token_refresh", _token_refresh),
+    Scenario("register", _register, writes=True),
+    Scenario("user_update", _user_update, writes=True),
+    Scenario("product_create", _product_create, writes=True),
+    Scenario("product_import", _product_import, writes=True, max_requests=100),
+    Scenario("basket_add", _basket_add, writes=True),
+    Scenario("basket_increment", _basket_increment, writes=True),
+    Scenario("basket_decrement", _basket_decrement, writes=True),
+    Scenario("basket_delete", _basket_delete, writes=True),
+    Scenario("basket_bulk_add", _basket_bulk_add, writes=True),
+    Scenario("basket_bulk_delete", _basket_bulk_delete, writes=True),
+    Scenario("basket_replace", _basket_replace, writes=True),
+    Scenario("basket_clear", _basket_clear, writes=True),
+]
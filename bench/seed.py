@@ -0,0 +1,78 @@
+import random
+from dataclasses import dataclass
+from typing import List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.service.auth_service.password_hasher import password_hasher
+
+BRANDS = ["Nike", "Adidas", "Puma", "Reebok", "Asics", "Converse", "Vans", "Salomon"]
+MODELS = ["Air", "Runner", "Classic", "Trail", "Court", "Street", "Flex", "Pro"]
+KINDS = ["кроссовки", "кеды", "ботинки", "сандалии", "слипоны"]
+COLORS = ["черные", "белые", "синие", "красные", "серые", "зеленые"]
+
+BENCH_PASSWORD = "bench-password"
+
+
+@dataclass
+class Volumes:
+    users: int
+    products: int
+    basket_items: int  # товаров в корзине каждого пользователя
+
+
+@dataclass
+class SeedInfo:
+    users: int
+    products: int
+    logins: List[str]
+    words: List[str]
+    basket: List[Tuple[int, int]]  # (UsersID, ProductID) всех позиций корзин
+
+
+async def seed(engine: AsyncEngine, volumes: Volumes, rng: random.Random) -> SeedInfo:
+    """Очищает таблицы и заполняет их через COPY; ID идут подряд с 1"""
+    # Один хэш на всех: bcrypt на каждого пользователя занял бы минуты
+    password = await password_hasher.hash(BENCH_PASSWORD)
+    logins = [f"bench{i}" for i in range(1, volumes.users + 1)]
+
+    async with engine.connect() as conn:
+        await conn.execute(text('TRUNCATE "Baskets", "Products", "Users" RESTART IDENTITY CASCADE'))
+        raw = (await conn.get_raw_connection()).driver_connection
+
+        await raw.copy_records_to_table(
+            "Users",
+            records=[(login, password, "Иван", "Петров") for login in logins],
+            columns=["Login", "Password", "Name", "Surname"],
+        )
+        await raw.copy_records_to_table(
+            "Products",
+            records=(
+                (
+                    f"{rng.choice(BRANDS)} {rng.choice(MODELS)} {rng.choice(KINDS)} {rng.choice(COLORS)}",
+                    round(rng.uniform(20, 300), 2),
+                    rng.choice([None, "Натуральная кожа", "Текстильный верх", "Для бега по асфальту"]),
+                )
+                for _ in range(volumes.products)
+            ),
+            columns=["Name", "Price", "Description"],
+        )
+        basket_items = min(volumes.basket_items, volumes.products)
+        basket = [
+            (user_id, product_id)
+            for user_id in range(1, volumes.users + 1)
+            for product_id in rng.sample(range(1, volumes.products + 1), basket_items)
+        ]
+        await raw.copy_records_to_table(
+            "Baskets",
+            records=((user_id, product_id, rng.randint(1, 3)) for user_id, product_id in basket),
+            columns=["UsersID", "ProductID", "Quantity"],
+        )
+        await conn.commit()
+        await conn.execute(text("ANALYZE"))
+        await conn.commit()
+
+    return SeedInfo(
+        users=volumes.users, products=volumes.products, logins=logins, words=BRANDS + MODELS, basket=basket
+    )
@@ -0,0 +1,31 @@
+"""Настройки gunicorn: несколько процессов uvicorn на одном порту.
+
+Каждый воркер - отдельный процесс со своим пулом соединений и своими кэшами;
+согласованность кэшей обеспечивает invalidation_bus (LISTEN/NOTIFY).
+Соединений с БД нужно до WEB_CONCURRENCY * (DB_POOL_SIZE + DB_MAX_OVERFLOW + 1).
+"""
+import multiprocessing
+import os
+import shutil
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+
+def on_starting(server):
+    # Метрики воркеров собираются через файлы в общем каталоге; старые файлы от прошлого запуска удаляются
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
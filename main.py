@@ -1,21 +1,78 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, HTTPException
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import ORJSONResponse
 import uvicorn
+from app.database.database import init_engine, dispose_engine, get_engine
+from app.database.replicas import ReadYourWritesMiddleware, replica_set
+from app.service.invalidation_service.invalidation_bus import invalidation_listener
+from app.service.image_service.image_pipeline import image_pipeline
+from app.service.auth_service.password_hasher import password_hasher
 from app.routing.main_router import main_router
+from app.routing.metrics.metrics_router import router as metrics_router
+from app.metrics.metrics import MULTIPROCESS, pool_exporter
+from app.metrics.middleware import MetricsMiddleware
+from app.metrics.query_tracker import instrument_engine
+from app.settings.settings import settings
+from app.static_files.uploads_static import UploadsStaticFiles
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Пул соединений создается один раз на процесс
+    await init_engine()
+    await replica_set.start()
+    if settings.METRICS_ENABLED:
+        for engine in (get_engine(), *replica_set.engines):
+            instrument_engine(engine)
+        if MULTIPROCESS:
+            pool_exporter.start()
+    # Каждый воркер слушает изменения, сделанные другими воркерами
+    invalidation_listener.start()
+    image_pipeline.start()
+    try:
+        yield
+    finally:
+        await pool_exporter.stop()
+        await invalidation_listener.stop()
+        await image_pipeline.shutdown()
+        password_hasher.shutdown()
+        await replica_set.dispose()
+        await dispose_engine()
+
 
 app = FastAPI(
     title= "Shoes",
     description="Платформа для поиска спортивных площадок",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+app.mount("/uploads", UploadsStaticFiles(directory=settings.UPLOAD_ROOT), name="uploads")
 app.include_router(main_router)
 
+if settings.db_replica_urls:
+    # Привязка к основной БД после записи нужна только при чтении с реплик
+    app.add_middleware(ReadYourWritesMiddleware)
+
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics_router)
+
+if settings.PROFILING_ENABLED:
+    # pyinstrument нужен только при включенном профилировании
+    from app.profiling.profiling import ProfileStore, ProfilingMiddleware
+
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=ProfileStore(settings.PROFILING_DIR, settings.PROFILING_MAX_FILES, settings.PROFILING_FORMAT)
+    )
+
 
 
 if __name__ == "__main__":
     uvicorn.run(app,host="0.0.0.0", port=8000)
 
-    
\ No newline at end of file
+    